@@ -20,7 +20,8 @@ class AdaptiveLRUCache:
         self.max_capacity = max_capacity
         self.current_capacity = base_capacity
         self._cache: OrderedDict[str, Any] = OrderedDict()
-        self._lock = threading.RLock()
+        # 재진입이 없으므로 RLock 대신 더 가벼운 Lock 사용
+        self._lock = threading.Lock()
         self._hit_count = 0
         self._miss_count = 0
         self._last_resize = time.time()
@@ -37,6 +38,7 @@ class AdaptiveLRUCache:
             return None
     
     def set(self, key: str, value: Any) -> None:
+        now = time.time()
         with self._lock:
             if key in self._cache:
                 self._cache.move_to_end(key)
@@ -48,9 +50,9 @@ class AdaptiveLRUCache:
             self._cache[key] = value
             
             # 주기적으로 캐시 크기 조정 (30초마다)
-            if time.time() - self._last_resize > 30:
+            if now - self._last_resize > 30:
                 self._adjust_capacity()
-                self._last_resize = time.time()
+                self._last_resize = now
     
     def delete(self, key: str) -> None:
         with self._lock:
@@ -113,7 +115,7 @@ class SmartTTLCache:
         self.default_ttl = default_ttl
         self.capacity = capacity
         self._data: OrderedDict[str, Tuple[float, Any, int]] = OrderedDict()  # (expire_time, value, access_count)
-        self._lock = threading.RLock()
+        self._lock = threading.Lock()
         self._last_cleanup = time.time()
     
     def get(self, key: str) -> Optional[Any]:
@@ -232,11 +234,9 @@ class CacheManager:
         """특정 경로와 관련된 모든 캐시 무효화"""
         path_str = str(path)
         
-        # 디렉토리 캐시 무효화
-        keys_to_delete = []
-        for key in self.dir_cache._cache.keys():
-            if path_str in key:
-                keys_to_delete.append(key)
+        # 디렉토리 캐시 무효화 (동시 수정 중 순회하지 않도록 락 안에서 키 스냅샷)
+        with self.dir_cache._lock:
+            keys_to_delete = [key for key in self.dir_cache._cache if path_str in key]
         
         for key in keys_to_delete:
             self.dir_cache.delete(key)
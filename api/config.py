@@ -1,50 +1,146 @@
 import os
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from math import floor
+from typing import FrozenSet
+
+_TRUTHY = {"1", "true", "yes", "y", "on"}
+# os.cpu_count()는 프로세스당 한 번만 조회
+_CPU = os.cpu_count() or 8
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in _TRUTHY
 
-# ===== 경로 / 포맷 =====
-ROOT_DIR = Path(os.getenv("PROJECT_ROOT", "/appdata/appuser/images")).resolve()
-THUMBNAIL_DIR = ROOT_DIR / "thumbnails"
-
-THUMBNAIL_SIZE_DEFAULT = int(os.getenv("THUMBNAIL_SIZE", "512"))
-THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "WEBP")
-THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "100"))
-
-SUPPORTED_EXTS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.webp', '.gif'}
-# 검색/인덱싱에서 건너뛸 폴더(쉼표로 구분)
-# 검색/인덱싱에서 건너뛸 폴더(쉼표로 구분)
-# 기본값에 labels/label/thumbnail 도 포함해 모든 동의어를 포괄
-SKIP_DIRS = set(os.getenv("SKIP_DIRS", "classification,thumbnails,thumbnail,labels,label").split(","))
-
-# ===== 동시성 / 성능 =====
-CPU_COUNT = os.cpu_count() or 8
-IO_THREADS = int(os.getenv("IO_THREADS", "0")) or max(8, CPU_COUNT)   # 디코딩/파일 I/O 풀
-# 최종 과부하: 9000/s 돌파를 위한 극한 설정
-THUMBNAIL_SEM = int(os.getenv("THUMBNAIL_SEM", str(max(256, CPU_COUNT * 12))))  # CPU * 12개 극한 동시 처리
-
-# 캐시 크기/TTL
-DIRLIST_CACHE_SIZE = int(os.getenv("DIRLIST_CACHE_SIZE", "1024"))
-THUMB_STAT_TTL_SECONDS = float(os.getenv("THUMB_STAT_TTL_SECONDS", "5"))
-THUMB_STAT_CACHE_CAPACITY = int(os.getenv("THUMB_STAT_CACHE_CAPACITY", "8192"))
-
-# ===== 라벨 저장 =====
-LABELS_DIR = ROOT_DIR / "classification"
-LABELS_FILE = LABELS_DIR / "labels.json"
-
-# ===== 서버 기본값 =====
-DEFAULT_HOST = os.getenv("HOST", "0.0.0.0")
-DEFAULT_PORT = int(os.getenv("PORT", "8080"))
-# reload 기본은 OFF (RELOAD=1이면 ON)
-DEFAULT_RELOAD = os.getenv("RELOAD", "0").strip().lower() in {"1", "true", "yes", "y", "on"}
 
 # 워커 기본: CPU의 75%에서 최소 24개
 def _default_workers():
-    return max(24, floor((os.cpu_count() or 8) * 0.75))
+    return max(24, floor(_CPU * 0.75))
+
+
+@dataclass(frozen=True)
+class Settings:
+    """프로세스 단위 설정 (환경변수는 get_settings()에서 한 번만 읽음)"""
+
+    # ===== 경로 / 포맷 =====
+    root_dir: Path
+    thumbnail_dir: Path
+    thumbnail_size_default: int
+    thumbnail_format: str
+    thumbnail_quality: int
+    supported_exts: FrozenSet[str]
+    # 검색/인덱싱에서 건너뛸 폴더
+    skip_dirs: FrozenSet[str]
+
+    # ===== 동시성 / 성능 =====
+    cpu_count: int
+    io_threads: int
+    thumbnail_sem: int
+
+    # 캐시 크기/TTL
+    dirlist_cache_size: int
+    thumb_stat_ttl_seconds: float
+    thumb_stat_cache_capacity: int
+
+    # 검색 인덱스 영속화 / 실시간 감시
+    file_index_path: Path
+    index_watch: bool
+    index_walk_threads: int
+
+    # ===== 라벨 저장 =====
+    labels_dir: Path
+    labels_file: Path
+
+    # ===== 서버 기본값 =====
+    default_host: str
+    default_port: int
+    default_reload: bool
+    default_workers: int
+
+    # ===== HTTPS 설정 =====
+    ssl_enabled: bool
+    https_port: int
+    ssl_certfile: str
+    ssl_keyfile: str
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """환경변수를 읽어 Settings를 만든다. 프로세스당 1회만 실행된다."""
+    root_dir = Path(os.getenv("PROJECT_ROOT", "/appdata/appuser/images")).resolve()
+    labels_dir = root_dir / "classification"
+    thumbnail_dir = root_dir / "thumbnails"
+    return Settings(
+        root_dir=root_dir,
+        thumbnail_dir=thumbnail_dir,
+        thumbnail_size_default=int(os.getenv("THUMBNAIL_SIZE", "512")),
+        thumbnail_format=os.getenv("THUMBNAIL_FORMAT", "WEBP"),
+        thumbnail_quality=int(os.getenv("THUMBNAIL_QUALITY", "100")),
+        supported_exts=frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.webp', '.gif'}),
+        # 기본값에 labels/label/thumbnail 도 포함해 모든 동의어를 포괄
+        skip_dirs=frozenset(os.getenv("SKIP_DIRS", "classification,thumbnails,thumbnail,labels,label").split(",")),
+        cpu_count=_CPU,
+        io_threads=int(os.getenv("IO_THREADS", "0")) or max(8, _CPU),   # 디코딩/파일 I/O 풀
+        # 최종 과부하: 9000/s 돌파를 위한 극한 설정 (CPU * 12개 극한 동시 처리)
+        thumbnail_sem=int(os.getenv("THUMBNAIL_SEM", str(max(256, _CPU * 12)))),
+        dirlist_cache_size=int(os.getenv("DIRLIST_CACHE_SIZE", "1024")),
+        thumb_stat_ttl_seconds=float(os.getenv("THUMB_STAT_TTL_SECONDS", "5")),
+        thumb_stat_cache_capacity=int(os.getenv("THUMB_STAT_CACHE_CAPACITY", "8192")),
+        # thumbnails 는 SKIP_DIRS 라 인덱스 파일 자체는 인덱싱/감시 대상이 아님
+        file_index_path=Path(os.getenv("FILE_INDEX_PATH", str(thumbnail_dir / "file_index.bin"))),
+        # 멀티 워커로 실행하면 main 의 __main__ 이 워커 시작 전에 INDEX_WATCH=0 을 기본값으로 넣음
+        index_watch=_env_flag("INDEX_WATCH", "1"),
+        # 인덱스 구축 시 동시 scandir 스레드 수 (NAS/HDD 지연 은닉용, 1이면 단일 스레드)
+        index_walk_threads=int(os.getenv("INDEX_WALK_THREADS", str(min(16, max(4, _CPU))))),
+        labels_dir=labels_dir,
+        labels_file=labels_dir / "labels.json",
+        default_host=os.getenv("HOST", "0.0.0.0"),
+        default_port=int(os.getenv("PORT", "8080")),
+        # reload 기본은 OFF (RELOAD=1이면 ON)
+        default_reload=_env_flag("RELOAD", "0"),
+        default_workers=int(os.getenv("WORKERS", str(_default_workers()))),
+        ssl_enabled=_env_flag("SSL_ENABLED", "1"),
+        https_port=int(os.getenv("HTTPS_PORT", "8443")),
+        ssl_certfile=os.getenv("SSL_CERTFILE", "cert/fullchain.pem"),
+        ssl_keyfile=os.getenv("SSL_KEYFILE", "cert/server.key"),
+    )
+
+
+# ===== 하위 호환용 모듈 상수 (기존 `config.X` / `from .config import X` 사용처) =====
+_S = get_settings()
+
+ROOT_DIR = _S.root_dir
+THUMBNAIL_DIR = _S.thumbnail_dir
+
+THUMBNAIL_SIZE_DEFAULT = _S.thumbnail_size_default
+THUMBNAIL_FORMAT = _S.thumbnail_format
+THUMBNAIL_QUALITY = _S.thumbnail_quality
+
+SUPPORTED_EXTS = _S.supported_exts
+SKIP_DIRS = _S.skip_dirs
+
+CPU_COUNT = _S.cpu_count
+IO_THREADS = _S.io_threads
+THUMBNAIL_SEM = _S.thumbnail_sem
+
+DIRLIST_CACHE_SIZE = _S.dirlist_cache_size
+THUMB_STAT_TTL_SECONDS = _S.thumb_stat_ttl_seconds
+THUMB_STAT_CACHE_CAPACITY = _S.thumb_stat_cache_capacity
+
+FILE_INDEX_PATH = _S.file_index_path
+INDEX_WATCH = _S.index_watch
+INDEX_WALK_THREADS = _S.index_walk_threads
+
+LABELS_DIR = _S.labels_dir
+LABELS_FILE = _S.labels_file
 
-DEFAULT_WORKERS = int(os.getenv("WORKERS", str(_default_workers())))
+DEFAULT_HOST = _S.default_host
+DEFAULT_PORT = _S.default_port
+DEFAULT_RELOAD = _S.default_reload
+DEFAULT_WORKERS = _S.default_workers
 
-# ===== HTTPS 설정 =====
-SSL_ENABLED = os.getenv("SSL_ENABLED", "1").strip().lower() in {"1", "true", "yes", "y", "on"}
-HTTPS_PORT = int(os.getenv("HTTPS_PORT", "8443"))
-SSL_CERTFILE = os.getenv("SSL_CERTFILE", "cert/fullchain.pem")
-SSL_KEYFILE = os.getenv("SSL_KEYFILE", "cert/server.key")
+SSL_ENABLED = _S.ssl_enabled
+HTTPS_PORT = _S.https_port
+SSL_CERTFILE = _S.ssl_certfile
+SSL_KEYFILE = _S.ssl_keyfile
@@ -0,0 +1,228 @@
+"""
+파일 인덱스 (Struct-of-Arrays)
+경로/크기/수정시각을 병렬 배열로 보관하고, 소문자 파일명은 하나의 바이트 블롭에 모아
+부분일치 검색을 C 레벨 bytes.find 로 수행
+"""
+
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 블롭 내 파일명 구분자 (파일명에 올 수 없는 문자)
+_SEP = b"\x00"
+
+# 저장 파일 형식: 매직 줄 + JSON 헤더 줄 + 원시 바이트 구간들 (pickle 처럼 로드 시 코드가 실행될 여지가 없음)
+_MAGIC = b"L3IDX1\n"
+_SECTIONS = ("rels", "sizes", "mtimes", "blob", "offsets")
+
+
+def _encode(name: str) -> bytes:
+    return name.encode("utf-8", "surrogatepass")
+
+
+class FileIndex:
+    """
+    ROOT 기준 상대경로 → (크기, 수정시각) 인덱스
+
+    레코드 i 의 값은 rels[i], sizes[i], mtimes[i] 이며, 소문자 파일명은
+    blob[offsets[i]:] 에서 다음 구분자 직전까지다. 블롭은 구분자로 시작하므로
+    모든 파일명이 양쪽 구분자로 감싸진다. 삭제된 레코드는 rels[i] 를 None 으로
+    표시(tombstone)하고, 저장 시 압축한다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rels: List[str] = []
+        self._sizes = array("q")
+        self._mtimes = array("d")
+        self._blob = bytearray(_SEP)
+        self._offsets = array("q")
+        self._pos: Dict[str, int] = {}
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._pos)
+
+    def __contains__(self, rel: str) -> bool:
+        return rel in self._pos
+
+    def upsert(self, rel: str, size: int, mtime: float) -> None:
+        """레코드 추가 (이미 있으면 크기/수정시각만 갱신)"""
+        with self._lock:
+            i = self._pos.get(rel)
+            if i is not None:
+                self._sizes[i] = size
+                self._mtimes[i] = mtime
+            else:
+                self._pos[rel] = len(self._rels)
+                self._rels.append(rel)
+                self._sizes.append(size)
+                self._mtimes.append(mtime)
+                self._offsets.append(len(self._blob))
+                self._blob += _encode(rel.rpartition("/")[2].lower())
+                self._blob += _SEP
+            self.version += 1
+
+    def upsert_many(self, records: Iterable[Tuple[str, int, float]]) -> None:
+        """(rel, size, mtime) 묶음을 락 1회로 반영 (인덱스 구축 시 배치 커밋용)"""
+        with self._lock:
+            pos, rels, sizes, mtimes = self._pos, self._rels, self._sizes, self._mtimes
+            offsets, blob = self._offsets, self._blob
+            for rel, size, mtime in records:
+                i = pos.get(rel)
+                if i is not None:
+                    sizes[i] = size
+                    mtimes[i] = mtime
+                    continue
+                pos[rel] = len(rels)
+                rels.append(rel)
+                sizes.append(size)
+                mtimes.append(mtime)
+                offsets.append(len(blob))
+                blob += _encode(rel.rpartition("/")[2].lower())
+                blob += _SEP
+            self.version += 1
+
+    def discard(self, rel: str) -> None:
+        """레코드 삭제"""
+        with self._lock:
+            i = self._pos.pop(rel, None)
+            if i is not None:
+                self._rels[i] = None
+                self.version += 1
+
+    def discard_prefix(self, prefix: str) -> None:
+        """prefix 하위(디렉토리) 레코드 일괄 삭제"""
+        with self._lock:
+            doomed = [rel for rel in self._pos if rel.startswith(prefix)]
+            for rel in doomed:
+                self._rels[self._pos.pop(rel)] = None
+            if doomed:
+                self.version += 1
+
+    def keys(self) -> List[str]:
+        """전체 상대경로 목록 (삽입 순서)"""
+        with self._lock:
+            return [rel for rel in self._rels if rel is not None]
+
+    def search(self, query_lower: str, goal: int) -> List[str]:
+        """소문자 파일명에 query_lower 가 포함된 상대경로를 최대 goal 개 반환"""
+        q = _encode(query_lower)
+        if not q or _SEP in q:
+            return []
+        out: List[str] = []
+        with self._lock:
+            blob, offsets, rels = self._blob, self._offsets, self._rels
+            n = len(offsets)
+            find = blob.find
+            pos = find(q)
+            while pos != -1:
+                i = bisect_right(offsets, pos) - 1
+                rel = rels[i]
+                if rel is not None:
+                    out.append(rel)
+                    if len(out) >= goal:
+                        break
+                # 같은 파일명 안의 추가 매치는 건너뛰고 다음 레코드부터 탐색
+                pos = find(q, offsets[i + 1]) if i + 1 < n else -1
+        return out
+
+    def find_by_name(self, filename: str) -> Optional[str]:
+        """파일명이 정확히 일치하는 첫 레코드의 상대경로"""
+        q = _SEP + _encode(filename.lower()) + _SEP
+        with self._lock:
+            blob, offsets, rels = self._blob, self._offsets, self._rels
+            pos = blob.find(q)
+            while pos != -1:
+                rel = rels[bisect_right(offsets, pos + 1) - 1]
+                if rel is not None and rel.rpartition("/")[2] == filename:
+                    return rel
+                pos = blob.find(q, pos + 1)
+        return None
+
+    # ----- 디스크 영속화 -----
+    def save(self, path: Path, root: str) -> None:
+        """인덱스를 원자적 저장 (tombstone 은 제외). 경로 목록은 NUL 구분 UTF-8, 배열은 tobytes() 원본"""
+        with self._lock:
+            if len(self._pos) == len(self._rels):
+                rels = list(self._rels)
+                sections = [None, self._sizes.tobytes(), self._mtimes.tobytes(),
+                            bytes(self._blob), self._offsets.tobytes()]
+            else:
+                live = [i for i, rel in enumerate(self._rels) if rel is not None]
+                rels = [self._rels[i] for i in live]
+                sections = [None,
+                            array("q", (self._sizes[i] for i in live)).tobytes(),
+                            array("d", (self._mtimes[i] for i in live)).tobytes(),
+                            b"", b""]  # 이름 블롭/오프셋은 로드 시 재구성
+        sections[0] = _SEP.join(map(_encode, rels))
+        header = {"root": root, "count": len(rels), "lengths": [len(b) for b in sections]}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(_MAGIC)
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for b in sections:
+                f.write(b)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path, root: str) -> Optional["FileIndex"]:
+        """save() 로 저장한 인덱스 로드. 파일이 없거나, 형식이 다르거나, 다른 ROOT 의 것이면 None"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if not data.startswith(_MAGIC):
+            return None
+        nl = data.find(b"\n", len(_MAGIC))
+        if nl < 0:
+            return None
+        try:
+            header = json.loads(data[len(_MAGIC):nl])
+            lengths = [int(n) for n in header["lengths"]]
+            count = int(header["count"])
+        except (ValueError, KeyError, TypeError):
+            return None
+        if header.get("root") != root or len(lengths) != len(_SECTIONS):
+            return None
+        parts = []
+        pos = nl + 1
+        for n in lengths:
+            parts.append(data[pos:pos + n])
+            pos += n
+        if pos != len(data):
+            return None
+        rel_bytes, sizes, mtimes, blob, offsets = parts
+        rels = [r.decode("utf-8", "surrogatepass") for r in rel_bytes.split(_SEP)] if count else []
+        if len(rels) != count or len(sizes) != 8 * count or len(mtimes) != 8 * count:
+            return None
+        index = cls()
+        if not blob:
+            # 압축된 저장본: 이름 블롭/오프셋 재구성
+            offs = array("q")
+            names = [_SEP]
+            pos = 1
+            for rel in rels:
+                name = _encode(rel.rpartition("/")[2].lower())
+                offs.append(pos)
+                names.append(name)
+                names.append(_SEP)
+                pos += len(name) + 1
+            index._blob = bytearray(b"".join(names))
+            index._offsets = offs
+        else:
+            if len(offsets) != 8 * count:
+                return None
+            index._blob = bytearray(blob)
+            index._offsets.frombytes(offsets)
+        index._rels = rels
+        index._sizes.frombytes(sizes)
+        index._mtimes.frombytes(mtimes)
+        index._pos = {rel: i for i, rel in enumerate(rels)}
+        return index
@@ -3,14 +3,13 @@ L3Tracker - Wafer Map Viewer API (HTTPS, Pretty Table Logs, Noise-free)
 """
 
 # ======================== Imports ========================
-import os, re, sys, json, time, shutil, asyncio, logging, logging.config, hashlib
+import os, re, sys, copy, json, contextlib, tempfile, stat, time, gzip, queue, atexit, shutil, asyncio, logging, logging.config, logging.handlers, hashlib
 from pathlib import Path
-from typing import List, Optional, Dict, Any, Tuple
-from collections import OrderedDict
-from threading import RLock
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-from urllib.parse import urlparse, parse_qs
+from typing import List, Optional, Dict, Any, Iterable, Set, Tuple
+from collections import OrderedDict, deque
+from functools import lru_cache
+from threading import Event, Lock, RLock, Thread
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from fastapi import FastAPI, HTTPException, Query, Request, Path as PathParam, Depends, Body
 from fastapi import Response as FastAPIResponse
@@ -18,7 +17,7 @@ from fastapi.responses import JSONResponse, FileResponse, Response, RedirectResp
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.gzip import GZipMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from pydantic import BaseModel, Field
 from PIL import Image
 try:
@@ -26,18 +25,42 @@ try:
     _VIPS_AVAILABLE = True
 except Exception:
     _VIPS_AVAILABLE = False
+try:
+    import tifffile
+    _TIFFFILE_AVAILABLE = True
+except Exception:
+    tifffile = None
+    _TIFFFILE_AVAILABLE = False
+try:
+    import brotli
+    _BROTLI_AVAILABLE = True
+except Exception:
+    brotli = None
+    _BROTLI_AVAILABLE = False
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except Exception:
+    orjson = None
+    _ORJSON_AVAILABLE = False
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    _WATCHDOG_AVAILABLE = True
+except Exception:
+    Observer = None
+    FileSystemEventHandler = object
+    _WATCHDOG_AVAILABLE = False
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 import http.client
 import urllib.parse
 
 from .access_logger import logger_instance
+from .file_index import FileIndex
 
-# SAML
-try:
-    from onelogin.saml2.auth import OneLogin_Saml2_Auth
-    from onelogin.saml2.settings import OneLogin_Saml2_Settings
-except Exception:
-    OneLogin_Saml2_Auth = None
-    OneLogin_Saml2_Settings = None
 from . import config
 
 # ================= Windows ANSI 색상 호환 =================
@@ -48,9 +71,15 @@ except Exception:
     pass
 
 # ================= wcwidth 기반 셀 패딩 ====================
+# cwcwidth(C 바인딩) → wcwidth(순수 파이썬) → unicodedata 근사 순으로 사용
 try:
-    from wcwidth import wcwidth as _wcwidth
+    from cwcwidth import wcwidth as _wcwidth
 except Exception:
+    try:
+        from wcwidth import wcwidth as _wcwidth
+    except Exception:
+        _wcwidth = None
+if _wcwidth is None:
     import unicodedata
     def _wcwidth(ch: str) -> int:
         if ch in ("\r", "\n", "\t"):
@@ -60,39 +89,74 @@ except Exception:
 def _one_line(s: str) -> str:
     return ("" if s is None else str(s)).replace("\r", " ").replace("\n", " ").replace("\t", " ")
 
+# BMP(U+0000~U+FFFF) 코드포인트별 표시 폭 테이블. 제어문자(음수 폭)는 255 로 표시
+_WCWIDTH_SKIP = 255
+_WCWIDTH_BMP = bytes(w if w >= 0 else _WCWIDTH_SKIP for w in map(_wcwidth, map(chr, range(0x10000))))
+
+def _char_class(width_run: bytes, extra: str = "") -> "re.Pattern":
+    """폭 테이블에서 width_run 패턴에 맞는 코드포인트 구간들로 정규식 문자 클래스 생성"""
+    spans = "".join(f"{re.escape(chr(m.start()))}-{re.escape(chr(m.end() - 1))}"
+                    for m in re.finditer(width_run, _WCWIDTH_BMP))
+    return re.compile(f"[{spans}{extra}]+")
+
+# 비ASCII 셀 폭을 C 레벨 정규식으로 계산: 폭 2 문자 / 폭이 0·음수·BMP 밖인 문자
+_WIDE_RE = _char_class(rb"\x02+")
+_ODD_WIDTH_RE = _char_class(rb"[\x00\xff]+", "\U00010000-\U0010ffff")
+
 def _pad_cell(s: str, width: int) -> str:
     s = _one_line(s)
+    # 대부분의 셀(시간/IP/메서드/상태/ASCII 경로)은 출력 가능한 ASCII 라 글자 수 = 표시 폭
+    if s.isascii() and s.isprintable():
+        return s[:width].ljust(width)
+    # 한글 등 폭 1/2 문자만 있고 잘림이 없으면 글자 단위 루프 없이 패딩
+    if _ODD_WIDTH_RE.search(s) is None:
+        n = len(s)
+        used = n + n - len(_WIDE_RE.sub("", s))
+        if used <= width:
+            return s + " " * (width - used)
+    table, skip, wcw = _WCWIDTH_BMP, _WCWIDTH_SKIP, _wcwidth
     out, used = [], 0
+    append = out.append
     for ch in s:
-        w = _wcwidth(ch)
-        if w < 0:
+        cp = ord(ch)
+        w = table[cp] if cp < 0x10000 else wcw(ch)
+        if w == skip or w < 0:
             continue
         if used + w > width:
             if used < width:
-                out.append("…"); used += 1
+                append("…"); used += 1
             break
-        out.append(ch); used += w
+        append(ch); used += w
     if used < width:
-        out.append(" " * (width - used))
+        append(" " * (width - used))
     return "".join(out)
 
 # ======================== Logging ========================
+_NOISE_FRAGMENTS = (
+    "invalid http request received",
+    "proactorbasepipetransport._call_connection_lost",
+    "winerror 10054",
+    "current connection was forcibly closed by the remote host",
+)
+
 class _SuppressNoise(logging.Filter):
     """자주 보이는 소음 로그(10054/connection_lost/Invalid HTTP request…) 억제"""
     def filter(self, record: logging.LogRecord) -> bool:
+        # 원문(msg)만으로 판정 가능한 경우 % 포매팅(getMessage)을 건너뜀
+        lower = str(record.msg).lower()
+        for frag in _NOISE_FRAGMENTS:
+            if frag in lower:
+                return False
+        if not record.args:
+            return True
+        # 인자로 치환되는 부분에 소음 문구가 있을 수 있으므로 그때만 포매팅
         try:
-            msg = record.getMessage()
+            lower = record.getMessage().lower()
         except Exception:
-            msg = str(record.msg)
-        lower = msg.lower()
-        if "invalid http request received" in lower:
-            return False
-        if "proactorbasepipetransport._call_connection_lost" in lower:
-            return False
-        if "winerror 10054" in lower:
-            return False
-        if "current connection was forcibly closed by the remote host" in lower:
-            return False
+            return True
+        for frag in _NOISE_FRAGMENTS:
+            if frag in lower:
+                return False
         return True
 
 LOGGING_CONFIG = {
@@ -135,21 +199,85 @@ CLR = {
     "blue": _ansi("34"), "magenta": _ansi("35"), "cyan": _ansi("36"), "white": _ansi("37"),
 }
 
+# 열 폭 상수 (log_access_row 에서 행마다 ACCESS_TABLE_WIDTHS 를 순회하지 않도록)
+_W = dict(ACCESS_TABLE_WIDTHS)
+_W_TAG, _W_TIME, _W_IP, _W_METHOD, _W_STS, _W_PATH, _W_NOTE = (
+    _W["TAG"], _W["TIME"], _W["IP"], _W["METHOD"], _W["STS"], _W["PATH"], _W["NOTE"])
+_RESET, _DIM, _WHITE = CLR["reset"], CLR["dim"], CLR["white"]
+
+# 테두리 채움 구간은 열 폭별로 한 번만 만들어 모든 테두리 줄이 공유
+_FILL_SEGS = {"─": tuple("─" * w for _, w in ACCESS_TABLE_WIDTHS)}
+
 def _border_line(ch_left: str, ch_mid: str, ch_right: str, ch_fill: str) -> str:
-    return ch_left + ch_mid.join(ch_fill * w for _, w in ACCESS_TABLE_WIDTHS) + ch_right
+    segs = _FILL_SEGS.get(ch_fill)
+    if segs is None:
+        segs = _FILL_SEGS[ch_fill] = tuple(ch_fill * w for _, w in ACCESS_TABLE_WIDTHS)
+    return ch_left + ch_mid.join(segs) + ch_right
 
 ACCESS_TABLE_HEADER = _border_line("┌", "┬", "┐", "─") + "\n" + \
     "│" + "│".join(_pad_cell(name, w) for name, w in ACCESS_TABLE_WIDTHS) + "│\n" + \
     _border_line("├", "┼", "┤", "─")
 ACCESS_TABLE_FOOTER = _border_line("└", "┴", "┘", "─")
 
+class _AccessLogWriter:
+    """
+    access.table 큐를 비우는 출력 스레드
+    대기 중인 행을 최대 batch 개까지 모아 write+flush 1회로 내보낸다 (행마다 syscall 하지 않음)
+    """
+
+    def __init__(self, q: "queue.SimpleQueue", stream, batch: int = 64):
+        self._q = q
+        self._stream = stream
+        self._batch = batch
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name="access-log", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """남은 행까지 출력하고 종료 (중복 호출 무해)"""
+        t, self._thread = self._thread, None
+        if t is not None:
+            self._q.put(None)
+            t.join()
+
+    def _run(self) -> None:
+        q, batch = self._q, self._batch
+        while True:
+            rec = q.get()
+            lines = []
+            while rec is not None:
+                lines.append(rec.getMessage())
+                if len(lines) >= batch:
+                    break
+                try:
+                    rec = q.get_nowait()
+                except queue.Empty:
+                    break
+            if lines:
+                try:
+                    self._stream.write("\n".join(lines) + "\n")
+                    self._stream.flush()
+                except Exception:
+                    pass
+            if rec is None:
+                return
+
+
+# 요청 경로에서는 큐에 넣기만 하고, stdout 쓰기는 출력 스레드가 담당
+# 핸들러 설치와 동시에 시작 (lifespan 없이 import 해 쓰는 경우에도 큐가 쌓이지 않도록)
 _access_table_logger = logging.getLogger("access.table")
+_ACCESS_LOG_WRITER: Optional[_AccessLogWriter] = None
 if not _access_table_logger.handlers:
-    _h = logging.StreamHandler(sys.stdout)
-    _h.setFormatter(logging.Formatter("%(message)s"))
-    _access_table_logger.addHandler(_h)
+    _access_log_queue = queue.SimpleQueue()
+    _ACCESS_LOG_WRITER = _AccessLogWriter(_access_log_queue, sys.stdout)
+    atexit.register(_ACCESS_LOG_WRITER.stop)
+    _access_table_logger.addHandler(logging.handlers.QueueHandler(_access_log_queue))
     _access_table_logger.setLevel(logging.INFO)
     _access_table_logger.propagate = False
+    _ACCESS_LOG_WRITER.start()
 
 _access_table_header_printed = False
 _access_count = 0
@@ -161,21 +289,39 @@ def print_access_header_once():
         _access_table_logger.info(ACCESS_TABLE_HEADER)
         _access_table_header_printed = True
 
+# 태그/메서드/상태코드별 ANSI 색 접두어 (행마다 dict 생성/분기 없이 조회만)
+_TAG_PRE = {"IMAGE": CLR["cyan"], "ACTION": CLR["magenta"], "API": CLR["blue"], "INFO": CLR["white"]}
+_METHOD_PRE = {"GET": CLR["cyan"], "POST": CLR["yellow"], "DELETE": CLR["red"], "PUT": CLR["magenta"]}
+_NOTE_PRE = {"IMAGE": CLR["white"], "ACTION": CLR["magenta"]}
+_STATUS_PRE: Dict[Any, str] = {}
+for _code in range(100, 600):
+    _STATUS_PRE[_code] = _STATUS_PRE[str(_code)] = (
+        CLR["green"] if 200 <= _code < 300 else CLR["yellow"] if 300 <= _code < 400 else CLR["red"])
+_STATUS_PRE["-"] = CLR["white"]  # 상태코드 없음('-') → 흰색
+del _code
+
+# 값 종류가 고정된 칼럼(태그/메서드/상태)은 "│색상+패딩된 값+리셋" 셀 전체를 미리 만들어 둠
+_TAG_CELL = {t: f"│{pre}{_pad_cell(t, _W_TAG)}{_RESET}" for t, pre in _TAG_PRE.items()}
+_METHOD_CELL = {m: f"│{pre}{_pad_cell(m, _W_METHOD)}{_RESET}" for m, pre in _METHOD_PRE.items()}
+_STATUS_CELL = {k: f"│{pre}{_pad_cell(str(k), _W_STS)}{_RESET}" for k, pre in _STATUS_PRE.items()}
+
 def _color_for_tag(tag: str) -> str:
-    return {"IMAGE": CLR["cyan"], "ACTION": CLR["magenta"], "API": CLR["blue"], "INFO": CLR["white"]}.get(tag, "")
+    return _TAG_PRE.get(tag, "")
 
 def _color_for_status(sts) -> str:
+    pre = _STATUS_PRE.get(sts)
+    if pre is not None:
+        return pre
     try:
         code = int(sts)
     except Exception:
-        return CLR["white"]  # 상태코드 없음('-') → 흰색
+        return CLR["white"]  # 숫자가 아닌 상태값 → 흰색
     if 200 <= code < 300: return CLR["green"]
     if 300 <= code < 400: return CLR["yellow"]
     return CLR["red"]
 
 def _color_for_method(m: str) -> str:
-    m = (m or "").upper()
-    return {"GET": CLR["cyan"], "POST": CLR["yellow"], "DELETE": CLR["red"], "PUT": CLR["magenta"]}.get(m, CLR["white"])
+    return _METHOD_PRE.get((m or "").upper(), CLR["white"])
 
 def shorten_note_path(abs_path: str, root_dir: str) -> str:
     try:
@@ -185,92 +331,106 @@ def shorten_note_path(abs_path: str, root_dir: str) -> str:
     except Exception:
         return abs_path
 
+def _note_path(request: Request) -> str:
+    return f"[{shorten_note_path(request.query_params.get('path', ''), ROOT_STR)}]"
+
+# 엔드포인트 prefix → NOTE (문자열 또는 request 를 받는 함수), 위에서부터 첫 매치
+_ENDPOINT_NOTES = (
+    ("/api/thumbnail", _note_path),
+    ("/api/image", _note_path),
+    ("/api/classify", "[분류작업]"),
+    ("/api/labels", "[라벨]"),
+    ("/api/classes", "[클래스]"),
+)
+_ENDPOINT_NOTE_PREFIXES = tuple(prefix for prefix, _ in _ENDPOINT_NOTES)
+
 def _note_from_request(request: Request, endpoint: str) -> str:
-    try:
-        qs = parse_qs(urlparse(str(request.url)).query)
-    except Exception:
-        qs = {}
-    if endpoint.startswith("/api/thumbnail"):
-        path = qs.get('path', [''])[0]
-        return f"[{shorten_note_path(path, str(ROOT_DIR))}]"
-    if endpoint.startswith("/api/image"):
-        path = qs.get('path', [''])[0]
-        return f"[{shorten_note_path(path, str(ROOT_DIR))}]"
-    if endpoint.startswith("/api/classify"):
-        return "[분류작업]"
-    if endpoint.startswith("/api/labels"):
-        return "[라벨]"
-    if endpoint.startswith("/api/classes"):
-        return "[클래스]"
+    if not endpoint.startswith(_ENDPOINT_NOTE_PREFIXES):
+        return ""
+    for prefix, note in _ENDPOINT_NOTES:
+        if endpoint.startswith(prefix):
+            return note if isinstance(note, str) else note(request)
     return ""
 
+# [epoch 초, 패딩된 시각 셀]
+_TS_CACHE = [0, ""]
+
 def log_access_row(*, tag: str, ip: str = "-", method: str = "-", status: str = "-",
                    path: str = "-", note: str = ""):
     """셀을 wcwidth 기준으로 패딩해 열 경계를 항상 맞춤."""
     global _access_count
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    plain_cells = {}
-    for col_name, width in ACCESS_TABLE_WIDTHS:
-        if col_name == "TAG":
-            plain_cells[col_name] = _pad_cell(tag, width)
-        elif col_name == "TIME":
-            plain_cells[col_name] = _pad_cell(ts, width)
-        elif col_name == "IP":
-            plain_cells[col_name] = _pad_cell(ip, width)
-        elif col_name == "METHOD":
-            plain_cells[col_name] = _pad_cell((method or "").upper(), width)
-        elif col_name == "STS":
-            plain_cells[col_name] = _pad_cell(str(status), width)
-        elif col_name == "PATH":
-            plain_cells[col_name] = _pad_cell(path, width)
-        elif col_name == "NOTE":
-            plain_cells[col_name] = _pad_cell(note, width)
-
-    tag_col    = f"{_color_for_tag(tag)}{plain_cells['TAG']}{CLR['reset']}"
-    method_col = f"{_color_for_method(method)}{plain_cells['METHOD']}{CLR['reset']}"
-    sts_col    = f"{_color_for_status(status)}{plain_cells['STS']}{CLR['reset']}"
-    path_col   = f"{CLR['dim']}{plain_cells['PATH']}{CLR['reset']}"
-    note_color = CLR["white"] if tag == "IMAGE" else (CLR["magenta"] if tag == "ACTION" else "")
-    note_col   = f"{note_color}{plain_cells['NOTE']}{CLR['reset']}" if note_color else plain_cells["NOTE"]
-
-    cells = [tag_col, plain_cells["TIME"], plain_cells["IP"], method_col, sts_col, path_col, note_col]
-    _access_table_logger.info("│" + "│".join(cells) + "│")
+    # 타임스탬프 셀은 초 단위로만 바뀌므로 패딩까지 끝낸 문자열을 재사용 (경합 시 1초 늦어도 무방)
+    now = int(time.time())
+    if _TS_CACHE[0] != now:
+        _TS_CACHE[1] = _pad_cell(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)), _W_TIME)
+        _TS_CACHE[0] = now
+    ts_cell = _TS_CACHE[1]
+
+    reset = _RESET
+    tag_cell = _TAG_CELL.get(tag)
+    if tag_cell is None:
+        tag_cell = f"│{_pad_cell(tag, _W_TAG)}{reset}"
+    method_cell = _METHOD_CELL.get(method)
+    if method_cell is None:
+        method_up = (method or "").upper()
+        method_cell = _METHOD_CELL.get(method_up) or f"│{_WHITE}{_pad_cell(method_up, _W_METHOD)}{reset}"
+    status_cell = _STATUS_CELL.get(status)
+    if status_cell is None:
+        status_cell = f"│{_color_for_status(status)}{_pad_cell(str(status), _W_STS)}{reset}"
+    note_pre = _NOTE_PRE.get(tag)
+    note_cell = _pad_cell(note, _W_NOTE)
+    _access_table_logger.info("".join((
+        tag_cell,
+        "│", ts_cell,
+        "│", _pad_cell(ip, _W_IP),
+        method_cell,
+        status_cell,
+        "│", _DIM, _pad_cell(path, _W_PATH), reset,
+        "│", (note_pre + note_cell + reset) if note_pre else note_cell,
+        "│",
+    )))
 
     _access_count += 1
     if ACCESS_TABLE_HEADER_EVERY and _access_count % ACCESS_TABLE_HEADER_EVERY == 0:
         _access_table_logger.info(ACCESS_TABLE_HEADER)
 
 # ======================== Config Bindings ========================
-ROOT_DIR = config.ROOT_DIR
-THUMBNAIL_DIR = config.THUMBNAIL_DIR
-SUPPORTED_EXTENSIONS = set(ext.lower() for ext in config.SUPPORTED_EXTS)
-
-THUMBNAIL_FORMAT = config.THUMBNAIL_FORMAT
-THUMBNAIL_QUALITY = config.THUMBNAIL_QUALITY
-THUMBNAIL_SIZE_DEFAULT = config.THUMBNAIL_SIZE_DEFAULT
-
-IO_THREADS = config.IO_THREADS
-THUMBNAIL_SEM_SIZE = config.THUMBNAIL_SEM
-
-DIRLIST_CACHE_SIZE = config.DIRLIST_CACHE_SIZE
-THUMB_STAT_TTL_SECONDS = config.THUMB_STAT_TTL_SECONDS
-THUMB_STAT_CACHE_CAPACITY = config.THUMB_STAT_CACHE_CAPACITY
-
-SKIP_DIRS = {d.strip() for d in config.SKIP_DIRS if d.strip()}
-
-LABELS_DIR = config.LABELS_DIR
-LABELS_FILE = config.LABELS_FILE
+S = config.get_settings()
+
+# 최초 설정 루트 (change-folder 와 무관하게 고정, 썸네일 폴더 기준)
+ORIGINAL_ROOT_DIR = S.root_dir
+
+# change-folder 에서 재바인딩되는 값만 전역으로 유지
+ROOT_DIR = S.root_dir
+# ROOT_DIR 의 문자열 형태: 상대경로를 Path 객체 없이 슬라이스로 얻기 위함 (change-folder 에서 함께 갱신)
+ROOT_STR = str(ROOT_DIR)
+ROOT_PREFIX = ROOT_STR if ROOT_STR.endswith(os.sep) else ROOT_STR + os.sep
+THUMBNAIL_DIR = S.thumbnail_dir
+LABELS_DIR = S.labels_dir
+LABELS_FILE = S.labels_file
+
+SUPPORTED_EXTENSIONS = frozenset(ext.lower() for ext in S.supported_exts)
+SKIP_DIRS = frozenset(d.strip() for d in S.skip_dirs if d.strip())
+# 목록/폴더 브라우징용 (대소문자 무시 비교). 요청마다 집합을 새로 만들지 않도록 한 번만 계산
+SKIP_DIRS_LOWER = frozenset(d.lower() for d in SKIP_DIRS)
+
+THUMBNAIL_FORMAT = S.thumbnail_format
+_THUMB_EXT = THUMBNAIL_FORMAT.lower()
+THUMBNAIL_SIZE_DEFAULT = S.thumbnail_size_default
+THUMBNAIL_SEM_SIZE = S.thumbnail_sem
 
 # ======================== Pools / State / Caches ========================
-IO_POOL = ThreadPoolExecutor(max_workers=IO_THREADS)
+IO_POOL = ThreadPoolExecutor(max_workers=S.io_threads)
 THUMBNAIL_SEM = asyncio.Semaphore(THUMBNAIL_SEM_SIZE)
 # 썸네일 전용 풀: 고속 배치 처리를 위해 더 많이
 THUMB_EXECUTOR = ThreadPoolExecutor(max_workers=THUMBNAIL_SEM_SIZE)
+# 전체 인덱스 구축 전용 (한 번에 하나만 실행되므로 1개, 프로세스 수명 동안 재사용)
+INDEX_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index")
+# 인덱스 준비 전 검색 폴백(_scan) 전용: 긴 디렉토리 순회가 IO_POOL 의 이미지/썸네일 작업을 점유하지 않도록 분리
+SEARCH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search")
 
-# 썸네일 인플라이트 중복 제거용 맵
+# 썸네일 인플라이트 중복 제거용 맵 (이벤트 루프 스레드에서만 접근하므로 락 불필요)
 THUMB_INFLIGHT: Dict[str, asyncio.Future] = {}
-THUMB_INFLIGHT_LOCK = RLock()
 
 # 고속 생성용: pyvips 인스턴스 풀 (메모리 재사용)
 VIPS_INSTANCE_POOL = []  # 메모리 효율성을 위한 인스턴스 풀
@@ -296,72 +456,127 @@ LOADING_PERF = {
 
 USER_ACTIVITY_FLAG = False
 BACKGROUND_TASKS_PAUSED = False
+# 처리 중인 사용자 요청 수 (이벤트 루프 스레드에서만 변경)
+USER_INFLIGHT = 0
+# 백그라운드 스레드용: set 이면 진행, clear 면 사용자 요청이 끝날 때까지 대기
+BACKGROUND_ALLOWED = Event()
+BACKGROUND_ALLOWED.set()
+# 사용자 요청이 계속 이어질 때 백그라운드 작업이 한 번에 기다리는 최대 시간
+BACKGROUND_WAIT_SECONDS = 0.1
 INDEX_BUILDING = False
 INDEX_READY = False
 
-FILE_INDEX: Dict[str, Dict[str, Any]] = {}
-FILE_INDEX_LOCK = RLock()
+# 검색 인덱스(SoA). 전체 재구축 시 새 인스턴스로 통째 교체한다.
+FILE_INDEX = FileIndex()
+# 인덱스 구축 시 한 번에 커밋하는 레코드 수
+INDEX_COMMIT_BATCH = 4096
+# 종료 시 저장, 시작 시 로드 → 재시작 직후에도 검색이 전체 디스크 순회 없이 동작
+FILE_INDEX_PATH = S.file_index_path
+INDEX_OBSERVER = None
 
 # 빠른 제품 폴더 접근을 위한 캐시
 ROOT_FOLDERS: List[Dict[str, str]] = []  # [{"name": "folder_name", "path": "full_path"}]
 ROOT_FOLDERS_READY = False
 
-LABELS: Dict[str, List[str]] = {}
+# rel → 라벨 집합 (메모리에서는 set, 저장/응답 시에만 정렬된 리스트로 변환)
+LABELS: Dict[str, Set[str]] = {}
 LABELS_LOCK = RLock()
 LABELS_MTIME: float = 0.0
 CLASSES_MTIME: float = 0.0
+# classification 하위 클래스 폴더 이름 (CLASSES_MTIME 이 바뀔 때만 다시 scandir)
+CLASSES_SET: Set[str] = set()
+# 요청마다 classification 폴더를 stat 하지 않도록 변경 확인 간격(초)을 둠
+CLASSES_RECHECK_SECONDS = 1.0
+_CLASSES_CHECKED = 0.0
+
+# 캐시는 키 해시로 샤드를 나눠 샤드별 Lock 만 잡는다 (요청 핸들러 간 락 경합 완화)
+CACHE_SHARDS = 16
 
 class LRUCache:
-    def __init__(self, capacity: int):
+    def __init__(self, capacity: int, shards: int = CACHE_SHARDS):
         self.capacity = capacity
-        self._cache: OrderedDict[str, Any] = OrderedDict()
-        self._lock = RLock()
+        self._mask = shards - 1  # shards 는 2의 거듭제곱
+        self._shard_cap = max(1, -(-capacity // shards))
+        self._shards: List[OrderedDict] = [OrderedDict() for _ in range(shards)]
+        self._locks = [Lock() for _ in range(shards)]
     def get(self, key: str):
-        with self._lock:
-            val = self._cache.get(key)
+        i = hash(key) & self._mask
+        cache = self._shards[i]
+        with self._locks[i]:
+            val = cache.get(key)
             if val is None: return None
-            self._cache.move_to_end(key);  return val
+            cache.move_to_end(key);  return val
     def set(self, key: str, value: Any):
-        with self._lock:
-            if key in self._cache: self._cache.move_to_end(key)
-            self._cache[key] = value
-            if len(self._cache) > self.capacity: self._cache.popitem(last=False)
+        i = hash(key) & self._mask
+        cache = self._shards[i]
+        with self._locks[i]:
+            if key in cache: cache.move_to_end(key)
+            cache[key] = value
+            if len(cache) > self._shard_cap: cache.popitem(last=False)
     def delete(self, key: str):
-        with self._lock: self._cache.pop(key, None)
+        i = hash(key) & self._mask
+        with self._locks[i]: self._shards[i].pop(key, None)
     def clear(self):
-        with self._lock: self._cache.clear()
+        for lock, cache in zip(self._locks, self._shards):
+            with lock: cache.clear()
 
-DIRLIST_CACHE = LRUCache(DIRLIST_CACHE_SIZE)
+DIRLIST_CACHE = LRUCache(S.dirlist_cache_size)
 
 class TTLCache:
-    def __init__(self, ttl_sec: float, capacity: int):
+    def __init__(self, ttl_sec: float, capacity: int, shards: int = CACHE_SHARDS):
         self.ttl = ttl_sec
         self.capacity = capacity
-        self._data: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
-        self._lock = RLock()
+        self._mask = shards - 1
+        self._shard_cap = max(1, -(-capacity // shards))
+        self._shards: List[OrderedDict] = [OrderedDict() for _ in range(shards)]
+        self._locks = [Lock() for _ in range(shards)]
     def get(self, key: str):
-        now = time.time()
-        with self._lock:
-            item = self._data.get(key)
+        now = time.monotonic()
+        i = hash(key) & self._mask
+        data = self._shards[i]
+        with self._locks[i]:
+            item = data.get(key)
             if not item: return None
             exp, val = item
             if exp < now:
-                del self._data[key];  return None
-            self._data.move_to_end(key);  return val
+                del data[key];  return None
+            data.move_to_end(key);  return val
     def set(self, key: str, value: Any):
-        now = time.time()
-        with self._lock:
-            if key in self._data: self._data.move_to_end(key)
-            self._data[key] = (now + self.ttl, value)
-            if len(self._data) > self.capacity: self._data.popitem(last=False)
+        exp = time.monotonic() + self.ttl
+        i = hash(key) & self._mask
+        data = self._shards[i]
+        with self._locks[i]:
+            if key in data: data.move_to_end(key)
+            data[key] = (exp, value)
+            if len(data) > self._shard_cap: data.popitem(last=False)
+    def delete(self, key: str):
+        i = hash(key) & self._mask
+        with self._locks[i]: self._shards[i].pop(key, None)
     def clear(self):
-        with self._lock: self._data.clear()
+        for lock, data in zip(self._locks, self._shards):
+            with lock: data.clear()
 
-THUMB_STAT_CACHE = TTLCache(THUMB_STAT_TTL_SECONDS, THUMB_STAT_CACHE_CAPACITY)
+THUMB_STAT_CACHE = TTLCache(S.thumb_stat_ttl_seconds, S.thumb_stat_cache_capacity)
+# 클래스 폴더 전체 이미지 목록 (페이지마다 재순회 방지). 키: (폴더, st_mtime_ns)
+# mtime 은 최상위 항목 변경만 반영하므로 하위 폴더 변경은 TTL 로 보정
+CLASS_LIST_CACHE = TTLCache(30.0, 256)
 THUMB_BACKEND: Dict[str, str] = {}
 
 # ======================== FastAPI & Middleware ========================
-app = FastAPI(title="L3Tracker API", version="2.6.0")
+def _json_dumps(content: Any) -> bytes:
+    """응답용 compact JSON 직렬화 (orjson 미설치 시 JSONResponse 와 같은 stdlib 설정)"""
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """orjson 으로 직렬화하는 JSONResponse (orjson 미설치 시 기본 json 사용)"""
+
+    def render(self, content: Any) -> bytes:
+        return _json_dumps(content)
+
+app = FastAPI(title="L3Tracker API", version="2.6.0", default_response_class=FastJSONResponse)
 
 # ======================== SAML SSO (OneLogin python3-saml) ========================
 SAML_DIR = Path("saml")
@@ -369,6 +584,33 @@ DEV_SAML = os.getenv("DEV_SAML", "1").strip().lower() in {"1", "true", "yes", "y
 AUTO_LOGIN = os.getenv("AUTO_LOGIN", "0").strip().lower() in {"1", "true", "yes", "y", "on"}
 DEFAULT_ORG_URL = os.getenv("DEFAULT_ORG_URL", "")
 
+@lru_cache(maxsize=1024)
+def _parse_session_meta(raw: str) -> Dict[str, Any]:
+    """session_meta 쿠키(JSON) 파싱. 같은 세션은 매 요청 같은 문자열이라 원문 기준으로 캐시
+    반환 dict 는 캐시와 공유되므로 수정하려면 복사해서 쓸 것"""
+    try:
+        meta = orjson.loads(raw) if _ORJSON_AVAILABLE else json.loads(raw)
+    except Exception:
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+def _session_meta_cookie(meta: Dict[str, Any]) -> str:
+    """session_meta 쿠키 값 직렬화 (비ASCII 그대로, orjson 우선)"""
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(meta).decode("utf-8")
+    return json.dumps(meta, ensure_ascii=False)
+
+@lru_cache(maxsize=1)
+def _saml_lib() -> Tuple[Any, Any]:
+    """python3-saml (OneLogin_Saml2_Auth, OneLogin_Saml2_Settings). 미설치면 (None, None)
+    SAML 을 쓰지 않는 배포에서는 xmlsec/lxml 까지 끌어오는 import 비용을 치르지 않도록 첫 사용 시 로드"""
+    try:
+        from onelogin.saml2.auth import OneLogin_Saml2_Auth
+        from onelogin.saml2.settings import OneLogin_Saml2_Settings
+    except Exception:
+        return None, None
+    return OneLogin_Saml2_Auth, OneLogin_Saml2_Settings
+
 def _load_saml_files() -> Tuple[Dict[str, Any], Dict[str, Any]]:
     base: Dict[str, Any] = {}
     adv: Dict[str, Any] = {}
@@ -412,6 +654,28 @@ def _load_saml_files() -> Tuple[Dict[str, Any], Dict[str, Any]]:
 
     return base, adv
 
+# 병합된 SAML 설정 캐시: (설정/인증서 파일들의 mtime 튜플, 병합 dict)
+_SAML_SETTINGS_FILES = ("settings.json", "advanced_settings.json", "certs/idp_x509.pem", "certs/sp.crt", "certs/sp.key")
+_SAML_SETTINGS_CACHE: Optional[Tuple[tuple, Dict[str, Any]]] = None
+
+def _saml_settings() -> Dict[str, Any]:
+    """settings.json + advanced_settings.json(+인증서) 병합 결과. 파일이 바뀔 때만 다시 읽는다
+    python3-saml 이 넘겨받은 dict 에 기본값을 채워 넣으므로 호출마다 사본을 반환"""
+    global _SAML_SETTINGS_CACHE
+    stamp = tuple(_stat_mtime_ns(SAML_DIR / name) for name in _SAML_SETTINGS_FILES)
+    cached = _SAML_SETTINGS_CACHE
+    if cached is None or cached[0] != stamp:
+        base, adv = _load_saml_files()
+        # security 등 상위 키는 advanced 쪽이 우선
+        cached = _SAML_SETTINGS_CACHE = (stamp, {**base, **(adv or {})})
+    return copy.deepcopy(cached[1])
+
+def _stat_mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
 def _prepare_fastapi_request(req: Request) -> Dict[str, Any]:
     host = req.headers.get("x-forwarded-host") or req.headers.get("host") or req.client.host
     proto = req.headers.get("x-forwarded-proto") or req.url.scheme
@@ -425,7 +689,8 @@ def _prepare_fastapi_request(req: Request) -> Dict[str, Any]:
         "https": "on" if proto == "https" else "off",
     }
 
-def _saml_auth(req: Request) -> OneLogin_Saml2_Auth:
+def _saml_auth(req: Request) -> Any:
+    OneLogin_Saml2_Auth = _saml_lib()[0]
     if OneLogin_Saml2_Auth is None:
         raise HTTPException(status_code=500, detail="python3-saml 미설치")
     # 파일 기반 로드를 사용해도 되지만, 여기서는 병합된 설정을 우선 사용
@@ -434,17 +699,10 @@ def _saml_auth(req: Request) -> OneLogin_Saml2_Auth:
 @app.get("/saml/metadata")
 async def saml_metadata():
     try:
+        OneLogin_Saml2_Settings = _saml_lib()[1]
         if OneLogin_Saml2_Settings is None:
             return PlainTextResponse("python3-saml 미설치", status_code=500)
-        base, adv = _load_saml_files()
-        combined = dict(base)
-        try:
-            # security 등 상위 키 병합
-            for k, v in (adv or {}).items():
-                combined[k] = v
-        except Exception:
-            pass
-        settings = OneLogin_Saml2_Settings(settings=combined, custom_base_path=str(SAML_DIR))
+        settings = OneLogin_Saml2_Settings(settings=_saml_settings(), custom_base_path=str(SAML_DIR))
         settings.set_strict(False)
         metadata = settings.get_sp_metadata()
         return Response(content=metadata, media_type="application/xml")
@@ -463,17 +721,15 @@ async def saml_login(request: Request):
         try:
             prev_meta = request.cookies.get("session_meta")
             if prev_meta:
-                import json as _json
-                cur = _json.loads(prev_meta)
-                cur.update(meta)
-                meta = cur
+                meta = {**_parse_session_meta(prev_meta), **meta}
         except Exception:
             pass
-        resp.set_cookie("session_meta", json.dumps(meta, ensure_ascii=False), max_age=7*24*3600, secure=True, httponly=False, samesite="Lax")
+        resp.set_cookie("session_meta", _session_meta_cookie(meta), max_age=7*24*3600, secure=True, httponly=False, samesite="Lax")
     return resp
 
 @app.post("/saml/acs")
 async def saml_acs(request: Request):
+    OneLogin_Saml2_Auth = _saml_lib()[0]
     if OneLogin_Saml2_Auth is None:
         return PlainTextResponse("python3-saml 미설치", status_code=500)
     form = dict(await request.form())
@@ -515,12 +771,10 @@ async def saml_acs(request: Request):
                 try:
                     prev = request.cookies.get("session_meta")
                     if prev:
-                        cur = json.loads(prev)
-                        cur.update(meta)
-                        meta = cur
+                        meta = {**_parse_session_meta(prev), **meta}
                 except Exception:
                     pass
-                resp.set_cookie("session_meta", json.dumps(meta, ensure_ascii=False), max_age=7*24*3600, secure=True, httponly=False, samesite="Lax")
+                resp.set_cookie("session_meta", _session_meta_cookie(meta), max_age=7*24*3600, secure=True, httponly=False, samesite="Lax")
             log_access_row(tag="INFO", path="/saml/acs", method="POST", status=302, note=f"DEV SAML(예외) 로그인: {user}")
             return resp
         return PlainTextResponse("ACS error: exception during processing", status_code=400)
@@ -577,12 +831,10 @@ async def saml_acs(request: Request):
         try:
             prev = request.cookies.get("session_meta")
             if prev:
-                cur = json.loads(prev)
-                cur.update(meta)
-                meta = cur
+                meta = {**_parse_session_meta(prev), **meta}
         except Exception:
             pass
-        resp.set_cookie("session_meta", json.dumps(meta, ensure_ascii=False), max_age=7*24*3600, secure=True, httponly=False, samesite="Lax")
+        resp.set_cookie("session_meta", _session_meta_cookie(meta), max_age=7*24*3600, secure=True, httponly=False, samesite="Lax")
     log_access_row(tag="INFO", path="/saml/acs", method="POST", status=302, note=f"SAML 로그인: {nameid}")
     return resp
 
@@ -633,7 +885,7 @@ async def saml_dev_login(request: Request):
     resp.headers["Location"] = "/"
     resp.set_cookie("session_user", user, max_age=7*24*3600, secure=True, httponly=True, samesite="Lax")
     if meta:
-        resp.set_cookie("session_meta", json.dumps(meta, ensure_ascii=False), max_age=7*24*3600, secure=True, httponly=False, samesite="Lax")
+        resp.set_cookie("session_meta", _session_meta_cookie(meta), max_age=7*24*3600, secure=True, httponly=False, samesite="Lax")
     log_access_row(tag="INFO", path="/saml/dev-login", method="GET", status=302, note=f"DEV 로그인: {user}")
     return resp
 
@@ -643,13 +895,8 @@ async def api_whoami(request: Request):
     user = request.cookies.get("session_user") or ""
     account = ""
     pc = ""
-    meta = {}
     meta_cookie = request.cookies.get("session_meta")
-    if meta_cookie:
-        try:
-            meta = json.loads(meta_cookie)
-        except Exception:
-            meta = {}
+    meta = _parse_session_meta(meta_cookie) if meta_cookie else {}
     if user and "@" in user:
         parts = user.split("@", 1)
         account = parts[0]
@@ -660,16 +907,21 @@ async def api_whoami(request: Request):
 # ===== 사내 ADFS/STS 헬스 체크 (핑) =====
 @app.get("/api/sso/ping")
 async def sso_ping(url: str = Query(..., description="예: http://stsds.secsso.net/adfs/ls/")):
+    # 동기 http.client 는 최대 timeout 동안 막히므로 이벤트 루프가 아닌 IO 풀에서 실행
+    return await asyncio.get_running_loop().run_in_executor(IO_POOL, _sso_ping_sync, url)
+
+def _sso_ping_sync(url: str) -> Dict[str, Any]:
     try:
         parsed = urllib.parse.urlparse(url)
         host = parsed.netloc
         scheme = parsed.scheme.lower()
         path = parsed.path or "/"
         conn = http.client.HTTPSConnection(host, timeout=3) if scheme == "https" else http.client.HTTPConnection(host, timeout=3)
-        conn.request("GET", path)
-        resp = conn.getresponse()
-        status = resp.status
-        conn.close()
+        try:
+            conn.request("GET", path)
+            status = conn.getresponse().status
+        finally:
+            conn.close()
         return {"ok": status < 500, "status": status}
     except Exception as e:
         return {"ok": False, "error": str(e)}
@@ -677,151 +929,221 @@ async def sso_ping(url: str = Query(..., description="예: http://stsds.secsso.n
 
 # ---- 사용자 우선 플래그 ----
 def set_user_activity():
-    global USER_ACTIVITY_FLAG, BACKGROUND_TASKS_PAUSED
+    global USER_INFLIGHT, USER_ACTIVITY_FLAG, BACKGROUND_TASKS_PAUSED
+    USER_INFLIGHT += 1
     USER_ACTIVITY_FLAG = True;  BACKGROUND_TASKS_PAUSED = True
+    BACKGROUND_ALLOWED.clear()
 
 def clear_user_activity():
-    global USER_ACTIVITY_FLAG
-    USER_ACTIVITY_FLAG = False
+    global USER_INFLIGHT, USER_ACTIVITY_FLAG, BACKGROUND_TASKS_PAUSED
+    USER_INFLIGHT -= 1
+    if USER_INFLIGHT <= 0:
+        # 마지막 요청이 끝나는 즉시 백그라운드 재개 (지연 재개 타이머 없음)
+        USER_INFLIGHT = 0
+        USER_ACTIVITY_FLAG = False;  BACKGROUND_TASKS_PAUSED = False
+        BACKGROUND_ALLOWED.set()
+
+def wait_background_turn():
+    """백그라운드 스레드: 사용자 요청 처리 중이면 끝날 때까지(최대 BACKGROUND_WAIT_SECONDS) 양보"""
+    if not BACKGROUND_ALLOWED.is_set():
+        BACKGROUND_ALLOWED.wait(BACKGROUND_WAIT_SECONDS)
 
-@app.middleware("http")
-async def user_priority_middleware(request: Request, call_next):
-    set_user_activity()
-    try:
-        response = await call_next(request)
-    finally:
-        asyncio.create_task(delayed_background_resume())
-    return response
+# ---- 라벨/클래스 노스토어 ----
+NO_STORE_PREFIXES = ("/api/labels", "/api/classes")
+NO_STORE_HEADERS = (
+    ("Cache-Control", "no-store, no-cache, must-revalidate, max-age=0"),
+    ("Pragma", "no-cache"),
+    ("Expires", "0"),
+)
+
+# ---- 요청 파이프라인 (자동 로그인 / 사용자 우선 / 노스토어 / 액세스 로그) ----
+class RequestPipelineMiddleware:
+    """
+    순수 ASGI 미들웨어 하나로 기존 3단 미들웨어(BaseHTTPMiddleware + @app.middleware x2)를 대체.
+    요청마다 anyio 태스크 그룹/Response 재포장이 생기지 않고 send 만 감싸서 처리한다.
+    """
 
-async def delayed_background_resume():
-    await asyncio.sleep(1.5)
-    global BACKGROUND_TASKS_PAUSED
-    BACKGROUND_TASKS_PAUSED = False
-    clear_user_activity()
+    def __init__(self, app):
+        self.app = app
 
-# ---- 라벨/클래스 노스토어 ----
-@app.middleware("http")
-async def no_store_for_labels_and_classes(request: Request, call_next):
-    response = await call_next(request)
-    p = request.url.path
-    if p.startswith("/api/labels") or p.startswith("/api/classes"):
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-    return response
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        path = scope["path"]
 
-# ---- 액세스 테이블 로그 ----
-class AccessTrackingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
         # 자동 로그인 강제: 세션 쿠키가 없고 HTML 페이지 접근 시 SAML 로그인으로 리다이렉트
-        if AUTO_LOGIN:
-            path = request.url.path
-            # 정적/JS/API 는 제외하고, 루트/페이지 접근만 리다이렉트
-            if not path.startswith(('/api/', '/js/', '/static/', '/saml/')):
-                if not request.cookies.get('session_user'):
-                    login_url = '/saml/login'
-                    if DEFAULT_ORG_URL:
-                        login_url += f"?org_url={DEFAULT_ORG_URL}"
-                    return RedirectResponse(login_url, status_code=302)
-        response = await call_next(request)
-
-        client_ip = logger_instance.get_client_ip(request)
-        user_cookie = request.cookies.get("session_user") or None
-        # 세션 메타(JSON) 파싱 시도
-        meta_cookie = request.cookies.get("session_meta")
-        meta_dict = None
-        if meta_cookie:
-            try:
-                meta_dict = json.loads(meta_cookie)
-            except Exception:
-                meta_dict = None
-        # 표시: 계정 이름 부서 IP (사내 claim 우선)
-        display_user = user_cookie or client_ip
-        if meta_dict:
-            # 사내 claim 매핑
-            name = (meta_dict.get('Username') or meta_dict.get('username') or 
-                   meta_dict.get('display_name') or meta_dict.get('name'))
-            dept = (meta_dict.get('DeptName') or meta_dict.get('department_name') or 
-                   meta_dict.get('department'))
-            login_id = meta_dict.get('login_id') or meta_dict.get('LginId') or meta_dict.get('LoginId')
-            
-            parts = []
-            # 계정 표시 (LginId 우선, 없으면 LoginId, 없으면 user_cookie)
-            if login_id and login_id != user_cookie:
-                parts.append(login_id)
-            elif user_cookie:
-                parts.append(user_cookie)
-            
-            if name: parts.append(name)
-            if dept: parts.append(dept)
-            parts.append(client_ip)
-            display_user = " | ".join(parts)
-        endpoint = str(request.url.path)
-        method = request.method
-        status = response.status_code
-
-        skip_prefix = ["/favicon.ico", "/static/", "/js/", "/api/files/all", "/api/stats", "/api/stats/", "/stats"]
-        if any(endpoint.startswith(p) for p in skip_prefix):
-            return response
-
-        if endpoint.startswith("/api/thumbnail"):
-            # 썸네일 요청은 로그 억제 (너무 많음)
-            tag = None  # 로그 비활성화
-        elif endpoint.startswith("/api/image"):
-            tag = "IMAGE" 
-        elif endpoint.startswith("/api/classify"):
-            tag = "ACTION"
-        else:
-            tag = "API"
+        # 정적/JS/API 는 제외하고, 루트/페이지 접근만 리다이렉트
+        if AUTO_LOGIN and not path.startswith(('/api/', '/js/', '/static/', '/saml/')) \
+                and not request.cookies.get('session_user'):
+            login_url = '/saml/login'
+            if DEFAULT_ORG_URL:
+                login_url += f"?org_url={DEFAULT_ORG_URL}"
+            await RedirectResponse(login_url, status_code=302)(scope, receive, send)
+            return
+
+        no_store = path.startswith(NO_STORE_PREFIXES)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if no_store:
+                    headers = MutableHeaders(scope=message)
+                    for k, v in NO_STORE_HEADERS:
+                        headers[k] = v
+            await send(message)
+
+        set_user_activity()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            clear_user_activity()
+        _log_request_access(request, path, scope["method"], status_code)
+
+# ---- 액세스 테이블 로그 ----
+# 집계도 출력도 하지 않는 경로 (str.startswith 에 튜플로 넘겨 C 레벨에서 한 번에 검사)
+_ACCESS_LOG_SKIP_PREFIXES = ("/favicon.ico", "/static/", "/js/", "/api/files/all", "/api/stats", "/stats")
+
+def _log_request_access(request: Request, endpoint: str, method: str, status: int):
+    # 정적 리소스/폴링성 API 는 쿠키 파싱 전에 종료
+    if endpoint.startswith(_ACCESS_LOG_SKIP_PREFIXES):
+        return
+
+    # 클라이언트 IP (logger_instance.get_client_ip 와 같은 우선순위를 인라인으로)
+    headers = request.headers
+    client_ip = headers.get("x-forwarded-for")
+    if client_ip:
+        client_ip = client_ip.split(",", 1)[0].strip()
+    else:
+        client_ip = headers.get("x-real-ip") or (request.client.host if request.client else "unknown")
+    user_cookie = request.cookies.get("session_user") or None
+    # 세션 메타(JSON) 파싱 (쿠키 원문 기준 캐시)
+    meta_cookie = request.cookies.get("session_meta")
+    meta_dict = _parse_session_meta(meta_cookie) if meta_cookie else None
 
+    if endpoint.startswith("/api/thumbnail"):
+        # 썸네일 요청은 통계만 집계하고 로그 행은 억제 (너무 많음) → 표시명/NOTE 계산 불필요
         try:
-            # 계정 쿠키(session_user)가 있으면 해당 사용자 기준으로 통계 집계 + 부서/팀/회사 메타
             logger_instance._update_stats(client_ip, endpoint, method, user_id_override=user_cookie, meta=meta_dict)
         except Exception:
             pass
-        # 내부 log_access 호출은 try/except로 무시되므로, 테이블 출력은 아래 한 번만 수행
-
-        note = _note_from_request(request, endpoint)
-        # NOTE 칼럼에 부서/팀/회사 간단 표기 (있을 때만)
-        if meta_dict:
-            bits = []
-            if meta_dict.get("company"): bits.append(meta_dict.get("company"))
-            if meta_dict.get("department"): bits.append(meta_dict.get("department"))
-            if meta_dict.get("team"): bits.append(meta_dict.get("team"))
-            if bits:
-                note = (note + " ").strip() + f"[{ ' / '.join(bits) }]"
-        # IP 칼럼에 계정(username@hostname) 우선 표시
-        # 썸네일 요청은 로그 억제 (tag=None인 경우)
-        if tag is not None:
-            log_access_row(tag=tag, ip=display_user, method=method, status=status, path=endpoint, note=note)
-        return response
-
-app.add_middleware(AccessTrackingMiddleware)
-app.add_middleware(GZipMiddleware, minimum_size=1024)
+        return
+
+    # 표시: 계정 이름 부서 IP (사내 claim 우선)
+    display_user = user_cookie or client_ip
+    if meta_dict:
+        # 사내 claim 매핑
+        name = (meta_dict.get('Username') or meta_dict.get('username') or 
+               meta_dict.get('display_name') or meta_dict.get('name'))
+        dept = (meta_dict.get('DeptName') or meta_dict.get('department_name') or 
+               meta_dict.get('department'))
+        login_id = meta_dict.get('login_id') or meta_dict.get('LginId') or meta_dict.get('LoginId')
+        
+        parts = []
+        # 계정 표시 (LginId 우선, 없으면 LoginId, 없으면 user_cookie)
+        if login_id and login_id != user_cookie:
+            parts.append(login_id)
+        elif user_cookie:
+            parts.append(user_cookie)
+        
+        if name: parts.append(name)
+        if dept: parts.append(dept)
+        parts.append(client_ip)
+        display_user = " | ".join(parts)
+
+    if endpoint.startswith("/api/image"):
+        tag = "IMAGE" 
+    elif endpoint.startswith("/api/classify"):
+        tag = "ACTION"
+    else:
+        tag = "API"
+
+    try:
+        # 계정 쿠키(session_user)가 있으면 해당 사용자 기준으로 통계 집계 + 부서/팀/회사 메타
+        logger_instance._update_stats(client_ip, endpoint, method, user_id_override=user_cookie, meta=meta_dict)
+    except Exception:
+        pass
+    # 내부 log_access 호출은 try/except로 무시되므로, 테이블 출력은 아래 한 번만 수행
+
+    note = _note_from_request(request, endpoint)
+    # NOTE 칼럼에 부서/팀/회사 간단 표기 (있을 때만)
+    if meta_dict:
+        bits = []
+        if meta_dict.get("company"): bits.append(meta_dict.get("company"))
+        if meta_dict.get("department"): bits.append(meta_dict.get("department"))
+        if meta_dict.get("team"): bits.append(meta_dict.get("team"))
+        if bits:
+            note = (note + " ").strip() + f"[{ ' / '.join(bits) }]"
+    # IP 칼럼에 계정(username@hostname) 우선 표시
+    log_access_row(tag=tag, ip=display_user, method=method, status=status, path=endpoint, note=note)
+
+app.add_middleware(RequestPipelineMiddleware)
+# 미리 압축해 두고 직접 Content-Encoding 을 붙여 응답하는 페이지 경로 (GZip 재압축 제외)
+PRECOMPRESSED_ROUTES = frozenset({"/", "/stats", "/main.js"})
+# 이미 압축된 이미지(JPEG/PNG/WEBP)를 내보내는 경로: 재압축은 CPU 낭비이고 FileResponse 의 sendfile 경로를 막음
+IMAGE_ROUTES = frozenset({"/api/image", "/api/thumbnail"})
+GZIP_BYPASS_ROUTES = PRECOMPRESSED_ROUTES | IMAGE_ROUTES
+
+class PrecompressedAwareGZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in GZIP_BYPASS_ROUTES:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(PrecompressedAwareGZipMiddleware, minimum_size=1024)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=False, allow_methods=["*"], allow_headers=["*"])
 
 # ======================== Utilities & Sync ========================
+def _ext_ok(name: str) -> bool:
+    """파일명 확장자가 지원 이미지인지 (Path.suffix/splitext 없이 rfind 한 번)"""
+    i = name.rfind(".")
+    # i == 0 은 '.png' 같은 숨김 파일: 확장자 없음으로 취급 (Path.suffix 와 동일)
+    return i > 0 and name[i:].lower() in SUPPORTED_EXTENSIONS
+
 def is_supported_image(path: Path) -> bool:
-    return path.suffix.lower() in SUPPORTED_EXTENSIONS
+    return _ext_ok(path.name)
+
+# 썸네일 경로 안전 문자열화: [A-Za-z0-9._-/] 외 문자는 '_' (썸네일 디스크 배치가 여기에 의존하므로 결과 불변 유지)
+# ASCII 경로는 str.translate 테이블로, 비ASCII 가 섞이면 코드포인트당 '_' 하나가 되도록 정규식으로 처리
+_THUMB_SAFE_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789._-/")
+_THUMB_SAFE_TABLE = str.maketrans({chr(c): "_" for c in range(128) if chr(c) not in _THUMB_SAFE_CHARS})
+_THUMB_UNSAFE_RE = re.compile(r"[^A-Za-z0-9._\-\/]")
 
 def get_thumbnail_path(image_path: Path, size: Tuple[int, int]) -> Path:
-    relative_path = image_path.relative_to(ROOT_DIR)
+    return _thumbnail_path_cached(str(image_path), size[0], size[1])
+
+@lru_cache(maxsize=65536)
+def _thumbnail_path_cached(src: str, width: int, height: int) -> Path:
+    """이미지 경로 → 썸네일 경로 (ROOT_DIR 변경 시 cache_clear)"""
+    if not src.startswith(ROOT_PREFIX):
+        raise ValueError(f"{src} is not under {ROOT_STR}")
     # 안전 문자열화 후 해시 서브폴더(ab/cd)
-    safe = str(relative_path).replace('\\', '/')
-    safe = re.sub(r"[^A-Za-z0-9._\-\/]", "_", safe)
+    safe = src[len(ROOT_PREFIX):].replace('\\', '/')
+    safe = safe.translate(_THUMB_SAFE_TABLE) if safe.isascii() else _THUMB_UNSAFE_RE.sub("_", safe)
     sha1 = hashlib.sha1(safe.encode("utf-8")).hexdigest()
     sub_a, sub_b = sha1[:2], sha1[2:4]
-    base_name = Path(safe).name
-    stem = Path(base_name).stem
-    thumbnail_name = f"{stem}_{size[0]}x{size[1]}.{THUMBNAIL_FORMAT.lower()}"
+    base_name = safe.rpartition("/")[2]
+    stem = base_name.rpartition(".")[0] or base_name
+    thumbnail_name = f"{stem}_{width}x{height}.{_THUMB_EXT}"
     return THUMBNAIL_DIR / sub_a / sub_b / thumbnail_name
 
+@lru_cache(maxsize=4096)
+def _resolve_under_root(root: Path, normalized: str) -> Path:
+    """(root / normalized).resolve() 메모이즈. 썸네일 그리드처럼 같은 경로가 반복 요청될 때 realpath 재실행 방지
+    (root 를 키에 포함하므로 change-folder 후 이전 루트 결과는 재사용되지 않음)"""
+    return (root / normalized).resolve()
+
 def safe_resolve_path(path: Optional[str]) -> Path:
     if not path: return ROOT_DIR
     try:
         normalized = os.path.normpath(str(path).lstrip("/\\"))
-        target = (ROOT_DIR / normalized).resolve()
-        if not str(target).startswith(str(ROOT_DIR)):
+        target = _resolve_under_root(ROOT_DIR, normalized)
+        # 루트 이탈 검사는 캐시 결과에도 매번 수행
+        if not str(target).startswith(ROOT_STR):
             raise HTTPException(status_code=400, detail="Invalid path")
         return target
     except HTTPException:
@@ -833,8 +1155,16 @@ def safe_resolve_path(path: Optional[str]) -> Path:
 def compute_etag(st) -> str:
     return f'W/"{st.st_mtime_ns:x}-{st.st_size:x}"'
 
+def _rel_from_abs(abs_str: str) -> str:
+    """ROOT_PREFIX 로 시작하는 절대경로 문자열 → '/' 구분 상대경로 (relative_to 대신 슬라이스)"""
+    rel = abs_str[len(ROOT_PREFIX):]
+    return rel.replace(os.sep, "/") if _NON_POSIX_SEP else rel
+
 def relkey_from_any_path(any_path: str) -> str:
     abs_path = safe_resolve_path(any_path)
+    abs_str = str(abs_path)
+    if abs_str.startswith(ROOT_PREFIX):
+        return _rel_from_abs(abs_str)
     return str(abs_path.relative_to(ROOT_DIR)).replace("\\", "/")
 
 def _classification_dir() -> Path:
@@ -859,31 +1189,49 @@ def _labels_reload_if_stale():
     global LABELS_MTIME
     try: st = LABELS_FILE.stat()
     except FileNotFoundError: return
-    if st.st_mtime > LABELS_MTIME: _labels_load()
-
-def _dircache_invalidate(path: Path):
-    try: DIRLIST_CACHE.delete(str(path))
-    except Exception: pass
-    try: DIRLIST_CACHE.delete(str(path.resolve()))
-    except Exception: pass
+    if st.st_mtime > LABELS_MTIME:
+        # 다른 워커가 저장한 파일을 락 밖에서 읽고, 교체 시 아직 flush 전인 이 프로세스의 변경은 다시 얹음
+        try:
+            loaded = _labels_read_file()
+        except Exception as e:
+            logger.error(f"라벨 로드 실패: {e}")
+            return
+        with LABELS_LOCK:
+            _labels_overlay_pending(loaded)
+        # stat 은 읽기 전에 했으므로, 그 사이 또 바뀌었다면 다음 호출에서 다시 로드됨
+        LABELS_MTIME = st.st_mtime
+        log_access_row(tag="INFO", note=f"라벨 로드: {len(loaded)}개 이미지 (mtime={LABELS_MTIME:.5f})")
 
 def _sync_labels_with_classes(existing_classes: set) -> int:
-    removed = 0
+    changed = []
     with LABELS_LOCK:
         for rel, labs in list(LABELS.items()):
-            new_labs = [x for x in labs if x in existing_classes]
-            if new_labs != labs:
-                LABELS[rel] = new_labs or LABELS.pop(rel, None) or []
-                removed += 1
-    if removed: _labels_save()
-    return removed
-
-def _sync_labels_if_classes_changed():
-    global CLASSES_MTIME
+            if not labs <= existing_classes:
+                labs &= existing_classes
+                if not labs: LABELS.pop(rel, None)
+                changed.append(rel)
+    if changed: _labels_mark_dirty(changed)
+    return len(changed)
+
+def _classes_reset():
+    """CLASSES_MTIME/CLASSES_SET 를 현재 디스크 상태로 맞춤 (라벨 정리 없이). 시작/폴더 변경 시 사용"""
+    global CLASSES_MTIME, CLASSES_SET, _CLASSES_CHECKED
+    CLASSES_MTIME = _classes_stat_mtime()
+    CLASSES_SET = _scan_classes()
+    _CLASSES_CHECKED = time.monotonic()
+
+def _sync_labels_if_classes_changed(force: bool = False):
+    """클래스 폴더가 바뀌었으면 CLASSES_SET 갱신 + 없는 클래스 라벨 정리
+    force=False 면 CLASSES_RECHECK_SECONDS 안의 재확인(stat)은 건너뜀 (외부 변경은 최대 그만큼 늦게 반영)"""
+    global CLASSES_MTIME, CLASSES_SET, _CLASSES_CHECKED
+    now = time.monotonic()
+    if not force and now - _CLASSES_CHECKED < CLASSES_RECHECK_SECONDS:
+        return
+    _CLASSES_CHECKED = now
     cur = _classes_stat_mtime()
     if cur > CLASSES_MTIME:
         CLASSES_MTIME = cur
-        classes = _scan_classes()
+        classes = CLASSES_SET = _scan_classes()
         cleaned = _sync_labels_with_classes(classes)
         if cleaned:
             logger.info(f"[SYNC] classes 변경 감지 → 라벨 {cleaned}개 이미지에서 정리됨")
@@ -892,21 +1240,35 @@ async def labels_classes_sync_dep():
     _labels_reload_if_stale()
     _sync_labels_if_classes_changed()
 
-def _remove_label_from_all_images(label_name: str) -> int:
-    removed = 0
+def _remove_labels_bulk(names: Set[str]) -> int:
+    """names 의 라벨을 모든 이미지에서 한 번의 순회로 제거. 변경된 이미지 수 반환"""
+    changed = []
     with LABELS_LOCK:
         for rel, labs in list(LABELS.items()):
-            if label_name in labs:
-                new_labs = [x for x in labs if x != label_name]
-                if new_labs: LABELS[rel] = new_labs
-                else: LABELS.pop(rel, None)
-                removed += 1
-    if removed:
-        _labels_save()
-        log_access_row(tag="INFO", note=f"라벨 완전 삭제: '{label_name}' → {removed}개 이미지에서 제거")
-    return removed
+            if not labs.isdisjoint(names):
+                labs -= names
+                if not labs: LABELS.pop(rel, None)
+                changed.append(rel)
+    if changed:
+        _labels_mark_dirty(changed)
+        log_access_row(tag="INFO", note=f"라벨 완전 삭제: {', '.join(sorted(names))} → {len(changed)}개 이미지에서 제거")
+    return len(changed)
 
 # ----- labels file I/O -----
+def _json_loads(data: bytes) -> Any:
+    return orjson.loads(data) if _ORJSON_AVAILABLE else json.loads(data.decode("utf-8"))
+
+def _json_dumps_pretty(obj: Any) -> bytes:
+    """들여쓰기 2칸, 비ASCII 그대로(UTF-8) 직렬화"""
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+def _labels_read_file() -> Dict[str, Set[str]]:
+    """labels.json → {rel: 라벨 set} (락 없이 파싱만)"""
+    data = _json_loads(LABELS_FILE.read_bytes())
+    return {k: set(map(str, v)) for k, v in data.items() if isinstance(v, list)}
+
 def _labels_load():
     global LABELS, LABELS_MTIME
     if not LABELS_FILE.exists():
@@ -915,10 +1277,10 @@ def _labels_load():
         LABELS_MTIME = 0.0
         return
     try:
+        # 읽기/파싱/set 변환은 락 밖에서 하고, 락은 교체 순간에만 잡음
+        loaded = _labels_read_file()
         with LABELS_LOCK:
-            with open(LABELS_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            LABELS = {k: [str(x) for x in v] for k, v in data.items() if isinstance(v, list)}
+            LABELS = loaded
         try:
             LABELS_MTIME = LABELS_FILE.stat().st_mtime
         except Exception:
@@ -928,103 +1290,463 @@ def _labels_load():
     except Exception as e:
         logger.error(f"라벨 로드 실패: {e}")
 
+def _labels_overlay_pending(loaded: Dict[str, Set[str]]):
+    """디스크에서 읽은 loaded 위에 아직 저장 안 된 이 프로세스의 변경을 얹고 LABELS 로 교체 (LABELS_LOCK 보유 상태에서 호출)"""
+    global LABELS
+    for rel in _LABELS_PENDING:
+        labs = LABELS.get(rel)
+        if labs: loaded[rel] = set(labs)
+        else: loaded.pop(rel, None)
+    LABELS = loaded
+
+@contextlib.contextmanager
+def _labels_file_lock():
+    """labels.json 읽기-병합-쓰기 구간의 워커(프로세스) 간 배타 락. fcntl 이 없으면(Windows) 프로세스 내 락만 사용"""
+    if fcntl is None:
+        yield
+        return
+    LABELS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(LABELS_FILE.with_suffix(".json.lock"), "a+b") as lf:
+        fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
+# 저장끼리 순서를 보장 (오래된 스냅샷이 최신 파일을 덮지 않도록). LABELS_LOCK 은 병합/스냅샷 복사 동안만 잡음
+_LABELS_SAVE_LOCK = Lock()
+
 def _labels_save():
+    """
+    다른 워커가 그 사이 저장한 labels.json 을 다시 읽어 이 프로세스의 보류 변경(_LABELS_PENDING)을 얹은 뒤 저장.
+    보류 표시는 파일 교체가 성공한 뒤에만, 스냅샷 시점까지의 변경분만 지운다.
+    """
     global LABELS_MTIME
     try:
-        LABELS_DIR.mkdir(parents=True, exist_ok=True)
-        tmp = LABELS_FILE.with_suffix(".json.tmp")
-        with LABELS_LOCK:
-            with open(tmp, "w", encoding="utf-8") as f:
-                json.dump(LABELS, f, ensure_ascii=False, indent=2)
+        with _LABELS_SAVE_LOCK, _labels_file_lock():
+            # mtime 해상도가 거친 파일시스템(NAS 등)도 있으므로 비교 없이 항상 최신 파일 기준으로 병합
+            try:
+                loaded = _labels_read_file()
+            except FileNotFoundError:
+                loaded = {}
+            except Exception as e:
+                logger.warning(f"라벨 파일 읽기 실패, 메모리 상태로 저장: {e}")
+                loaded = None
+            with LABELS_LOCK:
+                if loaded is not None:
+                    _labels_overlay_pending(loaded)
+                snapshot = {rel: sorted(labs) for rel, labs in LABELS.items()}
+                saved_seq = _LABELS_SEQ
+            # 직렬화/쓰기는 LABELS_LOCK 밖에서: 저장 중에도 라벨 변경 요청이 대기하지 않음
+            LABELS_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = LABELS_FILE.with_suffix(f".json.{os.getpid()}.tmp")
+            tmp.write_bytes(_json_dumps_pretty(snapshot))
             os.replace(tmp, LABELS_FILE)
-        try:
-            LABELS_MTIME = LABELS_FILE.stat().st_mtime
-        except Exception:
-            LABELS_MTIME = time.time()
+            with LABELS_LOCK:
+                for rel in [rel for rel, seq in _LABELS_PENDING.items() if seq <= saved_seq]:
+                    del _LABELS_PENDING[rel]
+            try:
+                LABELS_MTIME = LABELS_FILE.stat().st_mtime
+            except Exception:
+                LABELS_MTIME = time.time()
     except Exception as e:
         logger.error(f"라벨 저장 실패: {e}")
         raise HTTPException(status_code=500, detail="Failed to save labels")
 
+# ----- 라벨 저장 디바운스 -----
+# 라벨 변경마다 labels.json 전체를 다시 쓰지 않고, 변경 표시만 한 뒤 백그라운드 flusher 가
+# LABELS_FLUSH_DELAY 동안 모인 변경을 한 번에 저장한다. 종료 시에는 남은 변경을 즉시 저장.
+LABELS_FLUSH_DELAY = 0.25
+# 마지막 저장 이후 변경된 rel → 변경 순번 (LABELS_LOCK 하에서 갱신). 저장 도중 다시 바뀐 rel 은 남겨 두기 위함
+_LABELS_PENDING: Dict[str, int] = {}
+_LABELS_SEQ = 0
+_LABELS_FLUSH_EVENT: Optional[asyncio.Event] = None
+_LABELS_FLUSH_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+def _labels_mark_dirty(rels: Iterable[str]):
+    """변경된 rel 을 기록하고 저장 예약 (flusher 가 없으면 즉시 저장)"""
+    global _LABELS_SEQ
+    with LABELS_LOCK:
+        _LABELS_SEQ += 1
+        seq = _LABELS_SEQ
+        for rel in rels:
+            _LABELS_PENDING[rel] = seq
+    ev, loop = _LABELS_FLUSH_EVENT, _LABELS_FLUSH_LOOP
+    if ev is None:
+        _labels_flush()
+        return
+    loop.call_soon_threadsafe(ev.set)
+
+def _labels_flush():
+    """보류 중인 라벨 변경이 있으면 지금 저장 (실패 시 보류 상태 유지)"""
+    with LABELS_LOCK:
+        if not _LABELS_PENDING:
+            return
+    _labels_save()
+
+async def _labels_flusher():
+    ev = _LABELS_FLUSH_EVENT
+    while True:
+        await ev.wait()
+        await asyncio.sleep(LABELS_FLUSH_DELAY)
+        ev.clear()
+        try:
+            # JSON 직렬화 + 파일 교체는 워커 스레드에서 (이벤트 루프 블로킹 방지)
+            await asyncio.get_running_loop().run_in_executor(IO_POOL, _labels_flush)
+        except Exception:
+            pass  # _labels_save 가 이미 로그를 남김. 다음 변경/종료 시 재시도
+
 # ======================== Directory Listing / Index ========================
-def list_dir_fast(target: Path) -> List[Dict[str, str]]:
-    """극한 최속 디렉토리 스캔: 예외 처리 최소화 + 스마트 캐시"""
-    no_cache_paths = ["classification", "images", "labels"]
-    should_cache = not any(x in str(target).replace("\\", "/") for x in no_cache_paths)
-
-    key = str(target)
-    if should_cache:
-        cached = DIRLIST_CACHE.get(key)
-        if cached is not None:
-            return cached
-
-    directories = []
-    files = []
-    
-    # SKIP_DIRS는 모든 경로에서 적용 (루트만이 아니라 하위 폴더에서도 숨김)
-    skip_set = {s.strip().lower() for s in SKIP_DIRS}
-    
+def _scan_dir_listing(target: Path) -> Tuple[Tuple[str, ...], int]:
+    """
+    디렉토리 목록을 (이름 튜플, 폴더 개수) 로 반환. 폴더가 먼저, 각 그룹은 이름 내림차순.
+    DIRLIST_CACHE 에는 이 압축형(SoA)만 저장하고 dict 는 응답 시점에만 만든다.
+    캐시 키는 (경로, 디렉토리 st_mtime_ns): 항목이 추가/삭제/이름변경되면 mtime 이 바뀌어
+    자동으로 미스가 나므로 (외부 프로세스의 변경 포함) 별도 무효화가 필요 없다.
+    """
+    try:
+        key = (str(target), os.stat(target).st_mtime_ns)
+    except OSError:
+        return ((), 0)
+    cached = DIRLIST_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    directories: List[str] = []
+    files: List[str] = []
+    append_dir, append_file = directories.append, files.append
+    # SKIP_DIRS는 모든 경로에서 적용 (루트만이 아니라 하위 폴더에서도 숨김, 대소문자 무시)
+    skip_set = SKIP_DIRS_LOWER
+
     try:
-        # 최고속 스캔: 예외 처리 및 함수 호출 최소화
         with os.scandir(target) as entries:
             for entry in entries:
+                name = entry.name
+                if name[0] == '.' or name == '__pycache__' or name.lower() in skip_set:
+                    continue
+                # d_type 을 아는 파일시스템에서는 syscall 없이 판정. DT_UNKNOWN 일 때만 lstat 하며
+                # 그 실패(경합 삭제 등)는 해당 항목만 건너뜀
                 try:
-                    name = entry.name
-                    # 슠운 최속 검사: 문자열 첫 글자 확인
-                    if name[0] == '.' or name == '__pycache__':
-                        continue
-                    
-                    # 모든 경로에서 숨겨야 하는 폴더/파일명 건너뛰기
-                    # 비교는 대소문자 무시
-                    if name.lower() in skip_set:
-                        continue
-                    
-                    # is_dir 호출 최소화: 에러 발생시 건너뛰기
-                    try:
-                        is_directory = entry.is_dir(follow_symlinks=False)
-                    except (OSError, ValueError):
-                        continue
-                    
-                    entry_data = {
-                        "name": name, 
-                        "type": "directory" if is_directory else "file",
-                        "path": str(entry.path).replace('\\', '/')
-                    }
-                    
-                    if is_directory:
-                        directories.append(entry_data)
-                    else:
-                        files.append(entry_data)
-                        
-                except (OSError, ValueError):
-                    # 개별 엔트리 오류 무시
+                    is_directory = entry.is_dir(follow_symlinks=False)
+                except OSError:
                     continue
-        
+                if is_directory:
+                    append_dir(name)
+                else:
+                    append_file(name)
+
         # 최속 정렬: 조건부 정렬 (비어있으면 건너뛰기)
         if directories:
-            directories.sort(key=lambda x: x["name"].lower(), reverse=True)
+            directories.sort(key=str.lower, reverse=True)
         if files:
-            files.sort(key=lambda x: x["name"].lower(), reverse=True)
+            files.sort(key=str.lower, reverse=True)
         
-        items = directories + files
-        
-        # 스마트 캐시: 결과가 있을 때만 저장
-        if should_cache and items:
-            DIRLIST_CACHE.set(key, items)
+        listing = (tuple(directories + files), len(directories))
+        DIRLIST_CACHE.set(key, listing)
             
     except (FileNotFoundError, OSError, PermissionError):
-        items = []
+        listing = ((), 0)
     
-    return items
+    return listing
+
+def list_dir_fast(target: Path) -> List[Dict[str, str]]:
+    """극한 최속 디렉토리 스캔: 폴더(내림차순) → 파일(내림차순) 항목 dict 목록"""
+    names, n_dirs = _scan_dir_listing(target)
+    base = str(target).replace("\\", "/")
+    prefix = base if base.endswith("/") else base + "/"
+    return [
+        {"name": name, "type": "directory" if i < n_dirs else "file", "path": prefix + name}
+        for i, name in enumerate(names)
+    ]
+
+_NON_POSIX_SEP = os.sep != "/"
+
+def _iter_files(top: str, skip_dirs: frozenset = frozenset()):
+    """
+    top 하위 파일 DirEntry 를 스택 기반 scandir 로 순회 (rglob/os.walk 대체).
+    readdir 가 준 파일 타입을 그대로 써서 항목당 stat/Path 생성이 없다.
+    """
+    stack = deque((top,))
+    while stack:
+        d = stack.pop()
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    try:
+                        if e.is_dir(follow_symlinks=False):
+                            if e.name not in skip_dirs:
+                                stack.append(e.path)
+                        elif e.is_file():
+                            yield e
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+def _find_relpath_by_name(filename: str) -> Optional[str]:
+    """파일명으로 ROOT 기준 상대경로 조회: 인덱스 우선, 없으면 디스크 순회"""
+    rel = FILE_INDEX.find_by_name(filename)
+    if rel is not None:
+        return rel
+    for e in _iter_files(ROOT_STR, SKIP_DIRS):
+        if e.name == filename:
+            return _rel_from_abs(e.path)
+    return None
+
+def _scan_image_dir(d: str) -> Tuple[List[str], List[Tuple[str, os.stat_result]]]:
+    """
+    디렉토리 하나를 scandir 해 (하위 폴더 목록, [(이미지 경로, stat)]) 반환 (SKIP_DIRS 제외).
+    os.walk + Path.stat() 대신 DirEntry.stat() 을 재사용해
+    파일당 stat 시스템콜/Path 객체 생성을 없앤다.
+    """
+    subdirs: List[str] = []
+    files: List[Tuple[str, os.stat_result]] = []
+    try:
+        with os.scandir(d) as it:
+            for e in it:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        if e.name not in SKIP_DIRS:
+                            subdirs.append(e.path)
+                    elif _ext_ok(e.name) and e.is_file():
+                        files.append((e.path, e.stat()))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return subdirs, files
+
+def _iter_image_stats(top: str, workers: int = 1):
+    """
+    top 하위 이미지 파일을 디렉토리 단위로 [(경로, stat)] 묶어 반환.
+    workers > 1 이면 여러 디렉토리를 스레드로 동시에 scandir 해 NAS/HDD 의
+    시스템콜 지연을 겹친다. 결과 소비(인덱스 기록)는 호출 스레드 하나에서만 일어난다.
+    """
+    if workers <= 1:
+        stack = [top]
+        while stack:
+            subdirs, files = _scan_image_dir(stack.pop())
+            stack.extend(subdirs)
+            if files:
+                yield files
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index-walk") as pool:
+        pending = {pool.submit(_scan_image_dir, top)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                subdirs, files = fut.result()
+                pending.update(pool.submit(_scan_image_dir, d) for d in subdirs)
+                if files:
+                    yield files
+
+def _save_file_index():
+    try:
+        FILE_INDEX.save(FILE_INDEX_PATH, ROOT_STR)
+    except Exception as e:
+        log_access_row(tag="ERROR", note=f"인덱스 저장 실패: {e}")
+
+def _load_file_index() -> bool:
+    global FILE_INDEX, INDEX_READY
+    try:
+        loaded = FileIndex.load(FILE_INDEX_PATH, ROOT_STR)
+    except Exception as e:
+        log_access_row(tag="ERROR", note=f"인덱스 로드 실패: {e}")
+        return False
+    if loaded is None:
+        return False
+    FILE_INDEX = loaded
+    INDEX_READY = True
+    log_access_row(tag="INFO", note=f"저장된 인덱스 로드: {len(loaded)}개")
+    return True
+
+def _index_relpath(path: str) -> Optional[str]:
+    """감시 이벤트 경로 → 인덱스 키. 대상 외(ROOT 밖/SKIP_DIRS 하위)면 None"""
+    if not path.startswith(ROOT_PREFIX):
+        return None
+    rel = _rel_from_abs(path)
+    if any(part in SKIP_DIRS for part in rel.split("/")[:-1]):
+        return None
+    return rel
+
+def _index_add_path(path: str, index: FileIndex):
+    rel = _index_relpath(path)
+    if rel is None:
+        return
+    if os.path.isdir(path):
+        # 외부에서 폴더째 이동해 온 경우 하위 이벤트가 오지 않으므로 직접 순회
+        prefix = rel + "/"
+        base_len = len(path) + 1
+        for files in _iter_image_stats(path):
+            for p, st in files:
+                sub = p[base_len:]
+                if _NON_POSIX_SEP: sub = sub.replace("\\", "/")
+                index.upsert(prefix + sub, st.st_size, st.st_mtime)
+        return
+    if not _ext_ok(rel.rpartition("/")[2]):
+        return
+    try:
+        st = os.stat(path)
+    except OSError:
+        return
+    index.upsert(rel, st.st_size, st.st_mtime)
+
+def _index_remove_path(path: str, is_directory: bool, index: FileIndex):
+    rel = _index_relpath(path)
+    if rel is None:
+        return
+    if is_directory:
+        index.discard_prefix(rel + "/")
+    else:
+        index.discard(rel)
+
+# 전체 재구축 중에 온 감시 이벤트 기록. 구축 중에는 이벤트가 서비스 중인 기존 인덱스에만 반영되므로
+# 구축 스레드가 교체 직전에 새 인덱스에 재적용한다 (구축 중이 아니면 None)
+_INDEX_EVENT_LOCK = Lock()
+_INDEX_EVENT_LOG: Optional[List[Tuple[Any, tuple]]] = None
+
+def _index_event(op, *args):
+    """감시 이벤트를 현재 인덱스에 반영 (재구축 중이면 재적용용으로 기록도 남김)"""
+    with _INDEX_EVENT_LOCK:
+        if _INDEX_EVENT_LOG is not None:
+            _INDEX_EVENT_LOG.append((op, args))
+        index = FILE_INDEX
+    op(*args, index)
+
+def _index_swap_in(new_index: FileIndex):
+    """구축 중 쌓인 이벤트를 new_index 에 재적용한 뒤 FILE_INDEX 로 교체.
+    재적용(stat/순회)은 락 밖에서 하고, 기록이 빈 순간에만 락 안에서 교체하므로 그 사이 이벤트도 빠지지 않음"""
+    global FILE_INDEX, _INDEX_EVENT_LOG
+    while True:
+        with _INDEX_EVENT_LOCK:
+            events = _INDEX_EVENT_LOG or []
+            if not events:
+                FILE_INDEX = new_index
+                _INDEX_EVENT_LOG = None
+                return
+            _INDEX_EVENT_LOG = []
+        for op, args in events:
+            op(*args, new_index)
+
+class _IndexWatchHandler(FileSystemEventHandler):
+    """ROOT_DIR 파일 변경을 FILE_INDEX 에 실시간 반영"""
+
+    def on_created(self, event):
+        if event.is_directory:
+            _watch_top_dir(event.src_path)
+        _index_event(_index_add_path, event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            _index_event(_index_add_path, event.src_path)
+
+    def on_deleted(self, event):
+        if event.is_directory:
+            _unwatch_top_dir(event.src_path)
+        _index_event(_index_remove_path, event.src_path, event.is_directory)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            _unwatch_top_dir(event.src_path)
+            _watch_top_dir(event.dest_path)
+        _index_event(_index_remove_path, event.src_path, event.is_directory)
+        _index_event(_index_add_path, event.dest_path)
+
+# 감시는 ROOT 자체(비재귀) + SKIP_DIRS 가 아닌 최상위 폴더별 재귀 watch 로 건다.
+# thumbnails/classification 같은 대형 폴더에는 inotify watch 를 아예 만들지 않기 위함
+# (더 깊은 곳의 SKIP_DIRS 는 _index_relpath 에서 걸러짐)
+_INDEX_WATCH_HANDLER: Optional["_IndexWatchHandler"] = None
+_INDEX_WATCHES: Dict[str, Any] = {}   # 최상위 폴더 경로 → ObservedWatch
+# 감시 워커 선출용 락 파일 (선출되면 프로세스 수명 동안 열어 둠)
+_INDEX_WATCH_LOCK_FILE = None
+
+def _watch_top_dir(path: str):
+    """ROOT 바로 아래 폴더면 재귀 감시 추가 (SKIP_DIRS 제외)"""
+    observer = INDEX_OBSERVER
+    if observer is None or path in _INDEX_WATCHES or os.path.dirname(path) != ROOT_STR:
+        return
+    if os.path.basename(path) in SKIP_DIRS:
+        return
+    try:
+        _INDEX_WATCHES[path] = observer.schedule(_INDEX_WATCH_HANDLER, path, recursive=True)
+    except Exception as e:
+        log_access_row(tag="ERROR", note=f"폴더 감시 추가 실패: {path} ({e})")
+
+def _unwatch_top_dir(path: str):
+    watch = _INDEX_WATCHES.pop(path, None)
+    observer = INDEX_OBSERVER
+    if watch is not None and observer is not None:
+        try:
+            observer.unschedule(watch)
+        except Exception:
+            pass
+
+def _claim_index_watcher() -> bool:
+    """같은 서버의 uvicorn 워커들 중 하나만 파일 감시를 맡도록 락 파일로 선출.
+    나머지 워커는 감시 없이 동작하고 검색은 디스크 보충 순회를 유지한다. fcntl 이 없으면(Windows) 선출 없이 허용"""
+    global _INDEX_WATCH_LOCK_FILE
+    if _INDEX_WATCH_LOCK_FILE is not None or fcntl is None:
+        return True
+    tag = hashlib.sha1(str(ORIGINAL_ROOT_DIR).encode("utf-8")).hexdigest()[:12]
+    try:
+        f = open(Path(tempfile.gettempdir()) / f"l3tracker-index-watch-{tag}.lock", "a+b")
+    except OSError:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _INDEX_WATCH_LOCK_FILE = f
+    return True
+
+def _start_index_watcher():
+    global INDEX_OBSERVER, _INDEX_WATCH_HANDLER
+    if not (_WATCHDOG_AVAILABLE and S.index_watch) or INDEX_OBSERVER is not None:
+        return
+    if not _claim_index_watcher():
+        return
+    try:
+        observer = Observer()
+        _INDEX_WATCH_HANDLER = _IndexWatchHandler()
+        observer.schedule(_INDEX_WATCH_HANDLER, ROOT_STR, recursive=False)
+        observer.daemon = True
+        observer.start()
+        INDEX_OBSERVER = observer
+        with os.scandir(ROOT_STR) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    _watch_top_dir(e.path)
+    except Exception as e:
+        log_access_row(tag="ERROR", note=f"파일 감시 시작 실패: {e}")
+
+def _stop_index_watcher():
+    global INDEX_OBSERVER
+    observer, INDEX_OBSERVER = INDEX_OBSERVER, None
+    _INDEX_WATCHES.clear()
+    if observer is not None:
+        observer.stop()
+        observer.join(timeout=5)
 
 async def build_file_index_background():
-    global INDEX_BUILDING, INDEX_READY, ROOT_FOLDERS_READY
+    global INDEX_BUILDING, INDEX_READY, ROOT_FOLDERS_READY, _INDEX_EVENT_LOG
     if INDEX_BUILDING: return
-    INDEX_BUILDING, INDEX_READY = True, False
+    INDEX_BUILDING = True
+    # 디스크에서 로드한 인덱스가 있으면 재구축 중에도 그대로 서비스
+    if not len(FILE_INDEX):
+        INDEX_READY = False
     log_access_row(tag="INFO", note="백그라운드 인덱스 구축 시작")
 
     def _walk_and_index():
-        global INDEX_READY, ROOT_FOLDERS, ROOT_FOLDERS_READY
+        global INDEX_READY, ROOT_FOLDERS, ROOT_FOLDERS_READY, FILE_INDEX, _INDEX_EVENT_LOG
         start = time.time()
+        new_index = FileIndex()
+        with _INDEX_EVENT_LOCK:
+            # 이 시점 이후의 감시 이벤트는 기록해 두었다가 교체 직전에 new_index 에 재적용
+            _INDEX_EVENT_LOG = []
+            # 비어 있으면 바로 공개해 구축 중에도 검색 결과가 점진적으로 보이게 함
+            if not len(FILE_INDEX):
+                FILE_INDEX = new_index
         
         # 1단계: 루트 폴더들 먼저 스캔 (즉시 UI에서 사용 가능)
         try:
@@ -1042,33 +1764,70 @@ async def build_file_index_background():
         except Exception as e:
             log_access_row(tag="ERROR", note=f"루트 폴더 스캔 실패: {str(e)}")
         
-        # 2단계: 전체 파일 인덱싱 (기존 로직)
-        for root, dirs, files in os.walk(ROOT_DIR):
-            if BACKGROUND_TASKS_PAUSED or USER_ACTIVITY_FLAG: time.sleep(0.1)
-            for skip in list(SKIP_DIRS):
-                if skip in dirs: dirs.remove(skip)
-            for fn in files:
-                if os.path.splitext(fn)[1].lower() not in SUPPORTED_EXTENSIONS: continue
-                full = Path(root) / fn
-                try: rel = str(full.relative_to(ROOT_DIR)).replace("\\", "/")
-                except Exception: continue
-                try:
-                    st = full.stat()
-                    rec = {"name_lower": fn.lower(), "size": st.st_size, "modified": st.st_mtime}
-                    with FILE_INDEX_LOCK: FILE_INDEX[rel] = rec
-                except Exception:
-                    continue
-            time.sleep(0.001)
+        # 2단계: 전체 파일 인덱싱
+        root_len = len(ROOT_PREFIX)
+        # 파일마다 락을 잡지 않고 INDEX_COMMIT_BATCH 개씩 모아 한 번에 커밋
+        buf: List[Tuple[str, int, float]] = []
+        for files in _iter_image_stats(ROOT_STR, S.index_walk_threads):
+            wait_background_turn()
+            for path, st in files:
+                rel = path[root_len:]
+                if _NON_POSIX_SEP: rel = rel.replace("\\", "/")
+                buf.append((rel, st.st_size, st.st_mtime))
+            if len(buf) >= INDEX_COMMIT_BATCH:
+                new_index.upsert_many(buf)
+                buf = []
+        if buf:
+            new_index.upsert_many(buf)
+        _index_swap_in(new_index)
         INDEX_READY = True
         elapsed = time.time() - start
-        log_access_row(tag="INFO", note=f"전체 인덱스 구축 완료: {len(FILE_INDEX)}개, {elapsed:.1f}s")
+        log_access_row(tag="INFO", note=f"전체 인덱스 구축 완료: {len(new_index)}개, {elapsed:.1f}s")
+        _save_file_index()
 
     try:
-        await asyncio.get_running_loop().run_in_executor(ThreadPoolExecutor(max_workers=1), _walk_and_index)
+        await asyncio.get_running_loop().run_in_executor(INDEX_POOL, _walk_and_index)
     finally:
         INDEX_BUILDING = False
+        # 구축이 예외로 끝났으면 기록 중단 (기존 인덱스는 이벤트를 계속 직접 반영받고 있음)
+        with _INDEX_EVENT_LOCK:
+            _INDEX_EVENT_LOG = None
 
 # ======================== Thumbnails / Common ========================
+def _warm_image_decoders():
+    """디코더 초기화를 요청 경로 밖(서버 시작 시)에서 한 번에 수행"""
+    # 모든 포맷 플러그인 등록: 첫 Image.open 에서 여러 스레드가 동시에 플러그인을 로드하지 않도록
+    Image.init()
+    # 내부 데이터셋 전용: 대형 웨이퍼맵에서 decompression-bomb 검사/경고 생략
+    Image.MAX_IMAGE_PIXELS = None
+    if _VIPS_AVAILABLE:
+        # 파일마다 다른 이미지를 한 번씩만 처리하므로 vips 연산 캐시는 메모리만 차지
+        pyvips.cache_set_max(0)
+
+# 이 변 길이 이상인 TIFF 는 (pyvips 가 없을 때) tifffile 멀티스레드 디코드 사용
+TIFF_PARALLEL_MIN_SIDE = 4096
+TIFF_DECODE_WORKERS = 4
+
+# tifffile 배열을 그대로 Image.fromarray 로 옮겨도 색이 같은 Pillow 모드 → 기대 채널 수 (2차원이면 0)
+# 팔레트(P)는 색 인덱스, CMYK 는 4채널이 RGBA 로 해석되므로 제외. 16비트 등도 여기서 걸러 이중 디코드 방지
+_TIFF_PARALLEL_MODES = {"L": 0, "RGB": 3, "RGBA": 4}
+
+def _decode_tiff_parallel(image_path: Path, mode: str) -> Optional[Image.Image]:
+    """대형 TIFF 를 tifffile 로 병렬 디코드. mode 는 Pillow 가 헤더에서 읽은 모드이며
+    _TIFF_PARALLEL_MODES 에 없거나 배열 모양이 맞지 않으면 None (Pillow 로 처리)"""
+    channels = _TIFF_PARALLEL_MODES.get(mode)
+    if channels is None:
+        return None
+    try:
+        arr = tifffile.imread(str(image_path), key=0, maxworkers=TIFF_DECODE_WORKERS)
+    except Exception:
+        return None
+    if arr.dtype != "uint8":
+        return None
+    if (arr.ndim != 2) if channels == 0 else (arr.ndim != 3 or arr.shape[2] != channels):
+        return None
+    return Image.fromarray(arr, mode)
+
 def _generate_thumbnail_sync(image_path: Path, thumbnail_path: Path, size: Tuple[int, int]) -> str:
     """최고속 썸네일 생성. pyvips 우선 + 성능 최적화"""
     start_time = time.time()
@@ -1085,6 +1844,7 @@ def _generate_thumbnail_sync(image_path: Path, thumbnail_path: Path, size: Tuple
             # 9000/s 돌파 최종 설정: 최소한의 기능만 사용
             vimg = pyvips.Image.thumbnail(
                 str(image_path), width,
+                height=height,        # Pillow 경로와 동일하게 (width, height) 박스 안에 맞춤
                 size=pyvips.enums.Size.DOWN,  # DOWN으로 단순화 (BOTH보다 빠름)
                 auto_rotate=False,    # EXIF 회전 비활성화
                 linear=False,         # 빠른 보간
@@ -1126,72 +1886,102 @@ def _generate_thumbnail_sync(image_path: Path, thumbnail_path: Path, size: Tuple
             pass
 
     # Pillow 경로(무손실 보장)
+    # JPEG 는 thumbnail() 이 내부에서 draft() 로 DCT 단계 축소 디코드를 수행한다
     with Image.open(image_path) as img:
+        if (_TIFFFILE_AVAILABLE and img.format == "TIFF" and img.mode in _TIFF_PARALLEL_MODES
+                and max(img.size) >= TIFF_PARALLEL_MIN_SIDE):
+            img = _decode_tiff_parallel(image_path, img.mode) or img
         img.thumbnail((width, height), Image.Resampling.LANCZOS)
+        # 웨이퍼맵처럼 색 수가 적은 이미지(≤256색) 판별
+        low_color = img.mode in ("RGB", "L", "P") and img.getcolors(256) is not None
         save_kwargs = {"optimize": True}
         if fmt == "WEBP":
-            # Pillow WebP 무손실 저장
-            save_kwargs.update({"lossless": True, "quality": 100, "method": 6})
+            # Pillow WebP 무손실 저장. 저색상은 libwebp 가 팔레트로 인코딩하므로
+            # 최고속 method 로도 크기 차이가 거의 없다
+            save_kwargs.update({"lossless": True, "quality": 0 if low_color else 100,
+                                "method": 0 if low_color else 6})
         elif fmt == "PNG":
-            # PNG는 기본 무손실
-            pass
+            # PNG는 기본 무손실. 저색상은 8비트 팔레트로 저장 (색 손실 없음)
+            if low_color and img.mode == "RGB":
+                img = img.convert("P", palette=Image.Palette.ADAPTIVE, colors=256)
         else:
-            save_kwargs.update({"quality": THUMBNAIL_QUALITY})
+            save_kwargs.update({"quality": S.thumbnail_quality})
         img.save(thumbnail_path, fmt, **save_kwargs)
         elapsed = time.time() - start_time
         THUMBNAIL_PERF["pillow_count"] += 1
         THUMBNAIL_PERF["total_time"] += elapsed
         return "pillow"
 
-async def generate_thumbnail(image_path: Path, size: Tuple[int, int]) -> Path:
+def _stat_or_none(p) -> Optional[os.stat_result]:
+    """os.stat 한 번으로 존재 여부+메타데이터 확인 (exists()+stat() 이중 호출 방지)"""
+    try:
+        return os.stat(p)
+    except FileNotFoundError:
+        return None
+
+async def generate_thumbnail(image_path: Path, size: Tuple[int, int],
+                             src_st: Optional[os.stat_result] = None) -> Tuple[Path, os.stat_result, str]:
+    """
+    썸네일 경로, stat, ETag 를 반환. (stat, ETag) 는 THUMB_STAT_CACHE 에 보관해 응답에 재사용.
+    호출 측이 원본 stat(src_st)을 이미 갖고 있으면 넘겨 재조회를 생략한다.
+    """
     thumb = get_thumbnail_path(image_path, size)
     key = f"{thumb}|{size[0]}x{size[1]}"
 
-    if not image_path.exists():
+    if src_st is None:
+        src_st = _stat_or_none(image_path)
+    if src_st is None:
         raise FileNotFoundError(f"원본 이미지 파일이 존재하지 않습니다: {image_path}")
+    image_mtime = src_st.st_mtime
 
-    image_mtime = image_path.stat().st_mtime
-
-    cached = False
-    if thumb.exists() and thumb.stat().st_size > 0:
-        if thumb.stat().st_mtime >= image_mtime:    cached = THUMB_STAT_CACHE.get(key)
-    if cached:
-        THUMB_STAT_CACHE.set(key, True);  return thumb
+    cached = THUMB_STAT_CACHE.get(key)
+    if cached is not None and cached[0].st_mtime >= image_mtime:
+        return thumb, cached[0], cached[1]
 
-    # 인플라이트 중복 제거: 동일 key 작업 합치기
-    with THUMB_INFLIGHT_LOCK:
-        existing = THUMB_INFLIGHT.get(key)
-        if existing is not None:
-            # 이미 생성 중이면 그 결과를 기다린다
-            return await existing
-        fut = asyncio.get_running_loop().create_future()
-        THUMB_INFLIGHT[key] = fut
+    # 인플라이트 중복 제거: 동일 key 작업 합치기 (조회~등록 사이에 await 가 없어 원자적)
+    existing = THUMB_INFLIGHT.get(key)
+    if existing is not None:
+        # 이미 생성 중이면 그 결과를 기다린다
+        return await existing
+    fut = asyncio.get_running_loop().create_future()
+    THUMB_INFLIGHT[key] = fut
 
     try:
         async with THUMBNAIL_SEM:
-            if thumb.exists() and thumb.stat().st_size > 0 and thumb.stat().st_mtime >= image_mtime:
-                THUMB_STAT_CACHE.set(key, True)
+            st = _stat_or_none(thumb)
+            if st is not None and st.st_size > 0 and st.st_mtime >= image_mtime:
+                etag = compute_etag(st)
+                THUMB_STAT_CACHE.set(key, (st, etag))
                 if not fut.done():
-                    fut.set_result(thumb)
-                return thumb
-            if thumb.exists():
+                    fut.set_result((thumb, st, etag))
+                return thumb, st, etag
+            if st is not None:
                 try:
                     thumb.unlink()
                 except Exception as e:
                     logger.warning(f"기존 썸네일 삭제 실패: {thumb}, 오류: {e}")
             # 전역 변환 풀에서 실행 (IO_THREADS)
             backend = await asyncio.get_running_loop().run_in_executor(THUMB_EXECUTOR, _generate_thumbnail_sync, image_path, thumb, size)
-            THUMB_STAT_CACHE.set(key, True)
+            st = os.stat(thumb)
+            etag = compute_etag(st)
+            THUMB_STAT_CACHE.set(key, (st, etag))
             THUMB_BACKEND[key] = backend
             if not fut.done():
-                fut.set_result(thumb)
-            return thumb
+                fut.set_result((thumb, st, etag))
+            return thumb, st, etag
+    except Exception as e:
+        # 대기 중인 동일 요청도 같은 예외로 깨운다
+        if not fut.done():
+            fut.set_exception(e)
+            fut.exception()  # 대기자가 없을 때 'never retrieved' 경고 방지
+        raise
     finally:
-        with THUMB_INFLIGHT_LOCK:
-            THUMB_INFLIGHT.pop(key, None)
+        THUMB_INFLIGHT.pop(key, None)
 
-def maybe_304(request: Request, st) -> Optional[Response]:
-    etag = compute_etag(st)
+def maybe_304(request: Request, st, etag: Optional[str] = None) -> Optional[Response]:
+    """If-None-Match 일치 시 304. etag 를 이미 계산했다면 넘겨 재계산 방지"""
+    if etag is None:
+        etag = compute_etag(st)
     if request.headers.get("if-none-match") == etag:
         return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "public, max-age=604800, immutable"})
     return None
@@ -1270,22 +2060,15 @@ async def get_files(path: Optional[str] = None, prefer: Optional[str] = None):
         target = safe_resolve_path(path)
         if not target.exists() or not target.is_dir():
             return JSONResponse({"success": False, "error": "Not found"}, status_code=404)
-        if any(x in str(target).replace('\\', '/') for x in ['classification', 'images', 'labels']):
-            _dircache_invalidate(target)
         
         # 폴더 스캔 성능 측정 시작
         scan_time = time.time()
+        # list_dir_fast 가 이미 폴더(내림차순) → 파일(내림차순) 순서로 반환
         items = list_dir_fast(target)
         scan_elapsed = time.time() - scan_time
         
-        # 단순 정렬: 폴더(내림차순) → 파일(내림차순)
-        directories = [item for item in items if item['type'] == 'directory']
-        files = [item for item in items if item['type'] == 'file']
-        directories.sort(key=lambda x: x['name'].lower(), reverse=True)
-        files.sort(key=lambda x: x['name'].lower(), reverse=True)
-        
         total_elapsed = time.time() - scan_start
-        total_items = len(directories) + len(files)
+        total_items = len(items)
         
         # 성능 카운터 업데이트
         LOADING_PERF["folder_scans"] += 1
@@ -1297,7 +2080,7 @@ async def get_files(path: Optional[str] = None, prefer: Optional[str] = None):
             items_per_sec = total_items / max(0.001, total_elapsed)
             logger.info(f"📁 [PERF] Scanned {total_items} items in {target.name} - {total_elapsed:.2f}s ({items_per_sec:.0f}/s)")
         
-        return {"success": True, "items": directories + files}
+        return {"success": True, "items": items}
     except Exception as e:
         logger.exception(f"폴더 조회 실패: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1356,20 +2139,8 @@ def _lookup_original_relpath_from_classification_path(path_str: str) -> Optional
         p = Path(path_str).as_posix()
         if "/classification/" not in p and not p.startswith("classification/"):
             return None
-        filename = Path(p).name
-        # FILE_INDEX 키는 ROOT 기준 상대경로
-        with FILE_INDEX_LOCK:
-            for rel, _rec in FILE_INDEX.items():
-                if Path(rel).name == filename:
-                    return rel
-        # 인덱스가 아직 없으면 폴백: ROOT_DIR에서 탐색(최초 1회 비용)
-        for root, _dirs, files in os.walk(ROOT_DIR):
-            if filename in files:
-                abs_match = Path(root) / filename
-                try:
-                    return str(abs_match.relative_to(ROOT_DIR)).replace("\\", "/")
-                except Exception:
-                    return None
+        # FILE_INDEX 키는 ROOT 기준 상대경로. 인덱스가 아직 없으면 ROOT_DIR 순회로 폴백
+        return _find_relpath_by_name(Path(p).name)
     except Exception:
         return None
 
@@ -1382,7 +2153,8 @@ async def get_image(request: Request, path: str):
         if not image_path.exists() or not image_path.is_file():
             raise HTTPException(status_code=404, detail="Image not found")
         st = image_path.stat()
-        resp_304 = maybe_304(request, st)
+        etag = compute_etag(st)
+        resp_304 = maybe_304(request, st, etag)
         if resp_304: 
             # 304 캐시 히트도 카운트 (매우 빠른 응답)
             load_elapsed = time.time() - load_start
@@ -1393,7 +2165,7 @@ async def get_image(request: Request, path: str):
         file_size_mb = st.st_size / (1024 * 1024)
         headers = {
             "Cache-Control": "public, max-age=86400, immutable", 
-            "ETag": compute_etag(st),
+            "ETag": etag,
             "Content-Length": str(st.st_size)
         }
         
@@ -1407,7 +2179,8 @@ async def get_image(request: Request, path: str):
             method = "HEAD" if request.method == "HEAD" else "GET"
             logger.info(f"🖼️ [PERF] {method} {image_path.name} ({file_size_mb:.1f}MB) - {load_elapsed:.2f}s")
         
-        return FileResponse(image_path, headers=headers)
+        # stat_result 를 넘겨 FileResponse 내부의 추가 stat 호출 생략
+        return FileResponse(image_path, headers=headers, stat_result=st)
     except Exception as e:
         logger.exception(f"이미지 제공 실패: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1418,7 +2191,9 @@ async def get_thumbnail(request: Request, path: str, size: int = THUMBNAIL_SIZE_
     try:
         global LOADING_PERF
         image_path = safe_resolve_path(path)
-        if not image_path.exists() or not image_path.is_file():
+        # exists()+is_file()+원본 stat 을 stat 1회로 통합 (결과는 generate_thumbnail 에 전달)
+        src_st = _stat_or_none(image_path)
+        if src_st is None or not stat.S_ISREG(src_st.st_mode):
             raise HTTPException(status_code=404, detail="Image not found")
         # 이미지가 아니면 원본 파일을 썸네일로 제공하지 않음. 단, 확장자 오인으로 200을 주지 않도록 415 처리
         if not is_supported_image(image_path):
@@ -1433,26 +2208,36 @@ async def get_thumbnail(request: Request, path: str, size: int = THUMBNAIL_SIZE_
             THUMBNAIL_SEM = asyncio.Semaphore(max(4, THUMBNAIL_SEM_SIZE // 4))
 
         # 강제 재생성 옵션: 기존 썸네일 제거
-        thumb = get_thumbnail_path(image_path, (size, size))
         if refresh:
+            thumb = get_thumbnail_path(image_path, (size, size))
+            THUMB_STAT_CACHE.delete(f"{thumb}|{size}x{size}")
             try:
-                if thumb.exists():
-                    thumb.unlink()
+                thumb.unlink()
             except Exception:
                 pass
-        # 생성/재사용
-        thumb = await generate_thumbnail(image_path, (size, size))
-        st = thumb.stat()
-        resp_304 = maybe_304(request, st)
+        # 생성/재사용 (304 판정은 캐시된 stat/ETag 로)
+        thumb, st, etag = await generate_thumbnail(image_path, (size, size), src_st)
+        resp_304 = maybe_304(request, st, etag)
         if resp_304: return resp_304
-        headers = {"Cache-Control": "public, max-age=604800, immutable", "ETag": compute_etag(st)}
-        # FileResponse 생성 후 헤더 직접 주입(미들웨어와 충돌 방지)
-        resp = FileResponse(thumb)
-        for k, v in headers.items():
-            resp.headers[k] = v
         key = f"{thumb}|{size}x{size}"
+        # 본문을 보낼 때는 다시 stat: 캐시(최대 TTL) 사이 다른 워커가 재생성(refresh)/삭제했으면
+        # 캐시된 Content-Length 가 실제 파일과 어긋나므로 캐시를 버리고 다시 확보
+        fresh = _stat_or_none(thumb)
+        if fresh is None or fresh.st_size != st.st_size or fresh.st_mtime_ns != st.st_mtime_ns:
+            THUMB_STAT_CACHE.delete(key)
+            thumb, st, etag = await generate_thumbnail(image_path, (size, size), src_st)
+            resp_304 = maybe_304(request, st, etag)
+            if resp_304: return resp_304
+        else:
+            st = fresh
         backend = THUMB_BACKEND.get(key, "cache")
-        resp.headers["X-Thumb-Backend"] = backend
+        headers = {
+            "Cache-Control": "public, max-age=604800, immutable",
+            "ETag": etag,
+            "X-Thumb-Backend": backend,
+        }
+        # 방금 확인한 stat 을 넘겨 FileResponse 가 다시 stat 하지 않도록 함
+        resp = FileResponse(thumb, headers=headers, stat_result=st)
         
         # 성능 카운터 업데이트
         thumb_elapsed = time.time() - thumb_start
@@ -1494,16 +2279,19 @@ async def generate_thumbnails_batch(
     """
     if not paths:
         return JSONResponse({"success": True, "results": [], "stats": {"total": 0, "generated": 0}})
-    
+
+    # 그리드 재렌더링으로 같은 경로가 중복 요청되는 경우가 많아 한 번만 처리
+    unique_paths = list(dict.fromkeys(paths))
+
     # 최대 동시성 설정: 경량급 vs 대량 배치 자동 조절
-    if len(paths) > 1000:
+    if len(unique_paths) > 1000:
         # 대량 배치: 최종 과부하 모드 (9000/s 돌파!)
         max_concurrent = max_concurrent or min(THUMBNAIL_SEM_SIZE, 1024)
     else:
         # 소량 배치: 고성능 모드
         max_concurrent = max_concurrent or min(THUMBNAIL_SEM_SIZE // 2, 512)
     
-    concurrent_sem = asyncio.Semaphore(min(max_concurrent, len(paths)))
+    concurrent_sem = asyncio.Semaphore(min(max_concurrent, len(unique_paths)))
     
     start_time = time.time()
     results = []
@@ -1515,18 +2303,16 @@ async def generate_thumbnails_batch(
         try:
             async with concurrent_sem:
                 image_path = safe_resolve_path(path_str)
-                if not image_path.exists() or not is_supported_image(image_path):
+                src_st = _stat_or_none(image_path)
+                if src_st is None or not is_supported_image(image_path):
                     return {"path": path_str, "success": False, "error": "Invalid image"}
                 
-                # 기존 썸네일 확인
+                # 기존 썸네일 확인 (stat 1회)
                 thumb = get_thumbnail_path(image_path, (size, size))
-                if thumb.exists() and thumb.stat().st_size > 0:
-                    try:
-                        if thumb.stat().st_mtime >= image_path.stat().st_mtime:
-                            cached_count += 1
-                            return {"path": path_str, "success": True, "backend": "cache"}
-                    except Exception:
-                        pass
+                st = _stat_or_none(thumb)
+                if st is not None and st.st_size > 0 and st.st_mtime >= src_st.st_mtime:
+                    cached_count += 1
+                    return {"path": path_str, "success": True, "backend": "cache"}
                 
                 # 새로 생성
                 backend = await asyncio.get_running_loop().run_in_executor(
@@ -1537,26 +2323,29 @@ async def generate_thumbnails_batch(
                     (size, size)
                 )
                 generated_count += 1
+                # 이어지는 /api/thumbnail 요청이 바로 캐시 히트하도록 stat 기록
+                try:
+                    st = os.stat(thumb)
+                    THUMB_STAT_CACHE.set(f"{thumb}|{size}x{size}", (st, compute_etag(st)))
+                except OSError:
+                    pass
                 return {"path": path_str, "success": True, "backend": backend}
                 
         except Exception as e:
             return {"path": path_str, "success": False, "error": str(e)}
     
     # 모든 작업을 동시에 시작
-    tasks = [process_single(path_str) for path_str in paths]
+    tasks = [process_single(path_str) for path_str in unique_paths]
     results = await asyncio.gather(*tasks, return_exceptions=True)
     
     # 예외 처리
-    final_results = []
-    for i, result in enumerate(results):
+    by_path = {}
+    for path_str, result in zip(unique_paths, results):
         if isinstance(result, Exception):
-            final_results.append({
-                "path": paths[i], 
-                "success": False, 
-                "error": str(result)
-            })
-        else:
-            final_results.append(result)
+            result = {"path": path_str, "success": False, "error": str(result)}
+        by_path[path_str] = result
+    # 응답은 요청 순서/개수 그대로
+    final_results = [by_path[path_str] for path_str in paths]
     
     elapsed = time.time() - start_time
     throughput = len(paths) / elapsed if elapsed > 0 else 0
@@ -1579,7 +2368,8 @@ async def generate_thumbnails_batch(
             "total": len(paths),
             "generated": generated_count,
             "cached": cached_count,
-            "failed": len(paths) - generated_count - cached_count,
+            "unique": len(unique_paths),
+            "failed": len(unique_paths) - generated_count - cached_count,
             "elapsed_seconds": elapsed,
             "throughput_per_second": throughput,
             "max_concurrent": max_concurrent
@@ -1595,59 +2385,75 @@ async def search_files(q: str = Query(..., description="파일명 검색(대소
         if not query:
             return {"success": True, "results": [], "offset": offset, "limit": limit}
         goal = offset + limit
-        bucket: List[str] = []
+        bucket: List[str] = FILE_INDEX.search(query, goal)
 
-        with FILE_INDEX_LOCK:
-            items = list(FILE_INDEX.items())
-        if items:
-            for rel, meta in items:
-                if query in meta["name_lower"]:
-                    bucket.append(rel)
-                    if len(bucket) >= goal: break
-
-        if len(bucket) < goal:
+        # 인덱스가 준비되고 파일 감시로 실시간 갱신 중일 때만 인덱스 결과만 반환.
+        # 구축 중(warm-up)이거나 감시가 없으면(watchdog 미설치/INDEX_WATCH=0/시작 실패) 인덱스가
+        # 최신이 아닐 수 있으므로 부족분은 디스크 순회로 보충
+        if len(bucket) < goal and not (INDEX_READY and INDEX_OBSERVER is not None):
             seen = set(bucket); need = goal - len(bucket)
             def _scan():
                 nonlocal need
-                for root, dirs, files in os.walk(ROOT_DIR):
-                    for skip in list(SKIP_DIRS):
-                        if skip in dirs: dirs.remove(skip)
-                    for fn in files:
-                        ext = os.path.splitext(fn)[1].lower()
-                        if ext not in SUPPORTED_EXTENSIONS: continue
-                        low = fn.lower()
-                        if query not in low: continue
-                        full = Path(root) / fn
-                        try: rel = str(full.relative_to(ROOT_DIR)).replace("\\", "/")
-                        except Exception: continue
+                stack = [ROOT_STR]
+                while stack:
+                    try:
+                        with os.scandir(stack.pop()) as it:
+                            entries = list(it)
+                    except OSError:
+                        continue
+                    for e in entries:
+                        name = e.name
+                        try:
+                            if e.is_dir(follow_symlinks=False):
+                                if name not in SKIP_DIRS: stack.append(e.path)
+                                continue
+                            if not _ext_ok(name) or query not in name.lower() or not e.is_file():
+                                continue
+                        except OSError:
+                            continue
+                        rel = _rel_from_abs(e.path)
                         if rel in seen: continue
                         seen.add(rel); bucket.append(rel)
                         try:
-                            st = full.stat()
-                            rec = {"name_lower": low, "size": st.st_size, "modified": st.st_mtime}
-                            with FILE_INDEX_LOCK: FILE_INDEX[rel] = rec
-                        except Exception:
+                            # 매치된 파일만 stat (Windows 는 readdir 결과 캐시 사용)
+                            st = e.stat()
+                            FILE_INDEX.upsert(rel, st.st_size, st.st_mtime)
+                        except OSError:
                             pass
                         need -= 1
                         if need <= 0: return
-                    time.sleep(0.001)
             if need > 0:
-                await asyncio.get_running_loop().run_in_executor(ThreadPoolExecutor(max_workers=1), _scan)
+                await asyncio.get_running_loop().run_in_executor(SEARCH_POOL, _scan)
 
         results = bucket[offset: offset + limit]
-        return {"success": True, "results": results, "offset": offset, "limit": limit}
+        # 응답 객체를 직접 반환해 대량 문자열 목록의 jsonable_encoder 순회 생략
+        return FastJSONResponse({"success": True, "results": results, "offset": offset, "limit": limit})
     except Exception as e:
         logger.exception(f"검색 실패: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# /api/files/all 직렬화 결과 캐시: (인덱스 객체, 인덱스 version, JSON 바이트)
+_ALL_FILES_CACHE: Tuple[Optional[FileIndex], int, bytes] = (None, -1, b"")
+
+def _all_files_body() -> Tuple[bytes, int]:
+    """전체 목록 JSON 바이트와 파일 수. 인덱스가 바뀌지 않았으면 직렬화 결과를 재사용"""
+    global _ALL_FILES_CACHE
+    index = FILE_INDEX
+    version = index.version  # keys() 보다 먼저 읽어야 이후 변경분이 다음 요청에서 재직렬화됨
+    cached_index, cached_version, body = _ALL_FILES_CACHE
+    if cached_index is index and cached_version == version:
+        return body, len(index)
+    body = _json_dumps({"success": True, "files": index.keys()})
+    _ALL_FILES_CACHE = (index, version, body)
+    return body, len(index)
+
 @app.get("/api/files/all")
 async def get_all_files():
     try:
-        with FILE_INDEX_LOCK:
-            keys = list(FILE_INDEX.keys())
-        if not keys and not INDEX_BUILDING:
+        body, count = _all_files_body()
+        if not count and not INDEX_BUILDING:
             asyncio.create_task(build_file_index_background())
-        return {"success": True, "files": keys}
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         logger.exception(f"전체 파일 목록 조회 실패: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1657,19 +2463,13 @@ async def get_all_files():
 async def get_classes(_=Depends(labels_classes_sync_dep)):
     try:
         classification_dir = _classification_dir()
-        _dircache_invalidate(classification_dir)
         if not classification_dir.exists():
             classification_dir.mkdir(parents=True, exist_ok=True)
             log_access_row(tag="INFO", note=f"classification 폴더 생성: {classification_dir}")
             return {"success": True, "classes": []}
-        classes = []
-        try:
-            with os.scandir(classification_dir) as it:
-                for entry in it:
-                    if entry.is_dir(follow_symlinks=False): classes.append(entry.name)
-        except FileNotFoundError:
-            pass
-        return {"success": True, "classes": sorted(classes, key=str.lower)}
+        # 목록은 즉시 정확해야 하므로 간격 무시하고 stat 1회로 확인, 폴더가 바뀐 경우에만 재순회
+        _sync_labels_if_classes_changed(force=True)
+        return {"success": True, "classes": sorted(CLASSES_SET, key=str.lower)}
     except Exception as e:
         logger.exception(f"분류 클래스 조회 실패: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1679,16 +2479,15 @@ async def create_class(req: CreateClassReq, _=Depends(labels_classes_sync_dep)):
     try:
         name = req.name.strip()
         if not name or name.isspace(): raise HTTPException(status_code=400, detail="클래스명이 비어있습니다")
-        if any(ord(c) < 32 or ord(c) > 126 for c in name):
+        # 출력 가능한 ASCII(0x20~0x7E) 외 문자 차단 (C 레벨 검사)
+        if not (name.isascii() and name.isprintable()):
             raise HTTPException(status_code=400, detail="클래스명에 특수문자/한글 자모 사용 불가 (A-Z,a-z,0-9,_,-)")
         if not _CLASS_NAME_RE.match(name): raise HTTPException(status_code=400, detail="클래스명 형식 오류")
         if len(name) > 50: raise HTTPException(status_code=400, detail="클래스명이 너무 깁니다 (최대 50자)")
         class_dir = _classification_dir() / name
         if class_dir.exists(): raise HTTPException(status_code=409, detail="Class already exists")
         class_dir.mkdir(parents=True, exist_ok=False)
-        _sync_labels_if_classes_changed()
-        for p in (_classification_dir(), class_dir, ROOT_DIR): _dircache_invalidate(p)
-        DIRLIST_CACHE.clear()
+        _sync_labels_if_classes_changed(force=True)
         log_access_row(tag="INFO", note=f"클래스 '{name}' 생성 완료")
         return {"success": True, "class": name, "refresh_required": True, "message": f"클래스 '{name}' 생성됨"}
     except Exception as e:
@@ -1703,17 +2502,17 @@ async def delete_class(class_name: str = PathParam(..., min_length=1, max_length
         if not _CLASS_NAME_RE.match(class_name): raise HTTPException(status_code=400, detail="Invalid class_name")
         class_dir = _classification_dir() / class_name
         if not class_dir.exists() or not class_dir.is_dir(): raise HTTPException(status_code=404, detail="Class not found")
+        loop = asyncio.get_running_loop()
         if force:
-            shutil.rmtree(class_dir)
+            # 큰 클래스 폴더 삭제는 수 초 걸릴 수 있어 이벤트 루프 밖에서 실행
+            await loop.run_in_executor(IO_POOL, shutil.rmtree, class_dir)
             log_access_row(tag="INFO", note=f"클래스 삭제(force): {class_name}")
         else:
             if any(class_dir.iterdir()): raise HTTPException(status_code=409, detail="Class directory not empty")
             class_dir.rmdir()
             log_access_row(tag="INFO", note=f"클래스 삭제: {class_name}")
-        removed_cnt = _remove_label_from_all_images(class_name)
-        _labels_load()
-        for p in (_classification_dir(), class_dir, ROOT_DIR): _dircache_invalidate(p)
-        DIRLIST_CACHE.clear()
+        removed_cnt = _remove_labels_bulk({class_name})
+        await loop.run_in_executor(IO_POOL, _labels_flush)
         log_access_row(tag="INFO", note=f"클래스 '{class_name}' 삭제 완료")
         return {"success": True, "deleted": class_name, "force": force, "labels_cleaned": removed_cnt, "refresh_required": True}
     except Exception as e:
@@ -1727,20 +2526,22 @@ class DeleteClassesReq(BaseModel):
 async def delete_classes(req: DeleteClassesReq, _=Depends(labels_classes_sync_dep)):
     try:
         if not req.names: raise HTTPException(status_code=400, detail="클래스명 목록이 비어있습니다")
-        deleted, failed, total_cleaned = [], [], 0
+        deleted, failed = [], []
+        loop = asyncio.get_running_loop()
         for class_name in req.names:
             try:
                 class_name = class_name.strip()
                 if not _CLASS_NAME_RE.match(class_name): raise ValueError("Invalid class name")
                 class_dir = _classification_dir() / class_name
                 if not class_dir.exists() or not class_dir.is_dir(): raise FileNotFoundError("Class not found")
-                shutil.rmtree(class_dir); deleted.append(class_name)
-                total_cleaned += _remove_label_from_all_images(class_name)
+                await loop.run_in_executor(IO_POOL, shutil.rmtree, class_dir)
+                deleted.append(class_name)
             except Exception as e:
                 failed.append({"class": class_name, "error": str(e)})
                 logger.exception(f"클래스 {class_name} 삭제 실패: {e}")
-        if total_cleaned > 0: _labels_load()
-        _dircache_invalidate(_classification_dir())
+        # 삭제된 클래스 라벨은 LABELS 한 번 순회로 일괄 제거
+        total_cleaned = _remove_labels_bulk(set(deleted)) if deleted else 0
+        if total_cleaned > 0: await loop.run_in_executor(IO_POOL, _labels_flush)
         log_access_row(tag="INFO", note="배치 클래스 삭제 완료 - Label Explorer 새로고침 필요")
         return {"success": True, "deleted": deleted, "failed": failed, "labels_cleaned": total_cleaned,
                 "refresh_required": True, "message": f"{len(deleted)}개 삭제, {len(failed)}개 실패"}
@@ -1757,12 +2558,13 @@ async def class_images(class_name: str = PathParam(..., min_length=1, max_length
         if not _CLASS_NAME_RE.match(class_name): raise HTTPException(status_code=400, detail="Invalid class_name")
         class_dir = _classification_dir() / class_name
         if not class_dir.exists() or not class_dir.is_dir(): raise HTTPException(status_code=404, detail="Class not found")
-        found: List[str] = []; goal = offset + limit
-        for p in class_dir.rglob("*"):
-            if p.is_file() and is_supported_image(p):
-                rel = str(p.relative_to(ROOT_DIR)).replace("\\", "/")
-                found.append(rel)
-                if len(found) >= goal: break
+        key = (str(class_dir), class_dir.stat().st_mtime_ns)
+        found = CLASS_LIST_CACHE.get(key)
+        if found is None:
+            # 한 번 전체를 정렬해 두고 이후 페이지는 슬라이스만 (페이지 간 순서도 안정적)
+            found = sorted(_rel_from_abs(e.path)
+                           for e in _iter_files(str(class_dir)) if _ext_ok(e.name))
+            CLASS_LIST_CACHE.set(key, found)
         return {"success": True, "class": class_name, "results": found[offset: offset + limit], "offset": offset, "limit": limit}
     except Exception as e:
         logger.exception(f"클래스 이미지 조회 실패: {e}")
@@ -1779,9 +2581,9 @@ async def add_labels(req: LabelAddReq, _=Depends(labels_classes_sync_dep)):
         new_labels = [str(x).strip() for x in req.labels if str(x).strip()]
         if not new_labels: raise HTTPException(status_code=400, detail="Empty labels")
         with LABELS_LOCK:
-            cur = set(LABELS.get(rel, [])); cur.update(new_labels); LABELS[rel] = sorted(cur)
-        _labels_save(); _dircache_invalidate(_classification_dir())
-        return {"success": True, "image": rel, "labels": LABELS[rel]}
+            cur = LABELS.setdefault(rel, set()); cur.update(new_labels); labels = sorted(cur)
+        _labels_mark_dirty((rel,))
+        return {"success": True, "image": rel, "labels": labels}
     except Exception as e:
         logger.exception(f"라벨 추가 실패: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1796,10 +2598,11 @@ async def delete_labels(req: LabelDelReq, _=Depends(labels_classes_sync_dep)):
             else:
                 to_remove = {str(x).strip() for x in req.labels if str(x).strip()}
                 if not to_remove: raise HTTPException(status_code=400, detail="Empty labels to remove")
-                remain = [x for x in LABELS[rel] if x not in to_remove]
-                LABELS[rel] = remain or LABELS.pop(rel, None) or []
-        _labels_save(); _dircache_invalidate(_classification_dir())
-        return {"success": True, "image": rel, "labels": LABELS.get(rel, [])}
+                LABELS[rel] -= to_remove
+                if not LABELS[rel]: LABELS.pop(rel, None)
+            labels = sorted(LABELS.get(rel, ()))
+        _labels_mark_dirty((rel,))
+        return {"success": True, "image": rel, "labels": labels}
     except Exception as e:
         logger.exception(f"라벨 제거 실패: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1812,7 +2615,7 @@ async def delete_labels_post(req: LabelDelReq, _=Depends(labels_classes_sync_dep
 async def get_labels(image_path: str, _=Depends(labels_classes_sync_dep)):
     try:
         rel = relkey_from_any_path(image_path)
-        with LABELS_LOCK: labels = list(LABELS.get(rel, []))
+        with LABELS_LOCK: labels = sorted(LABELS.get(rel, ()))
         return {"success": True, "image": rel, "labels": labels}
     except Exception as e:
         logger.exception(f"라벨 조회 실패: {e}")
@@ -1937,6 +2740,96 @@ async def export_detailed_access():
         return {"error": f"파일 읽기 실패: {str(e)}"}
 
 # ---------------- Classification ----------------
+# 커널/OS 복사 경로: Linux 는 FICLONE(reflink) → copy_file_range, Windows 는 CopyFileExW
+_FICLONE = 0x40049409  # linux/fs.h _IOW(0x94, 9, int)
+
+_kernel32 = None
+_CopyFileExW = None
+if os.name == "nt":
+    try:
+        import ctypes
+        from ctypes import wintypes
+        _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        _CopyFileExW = _kernel32.CopyFileExW
+        _CopyFileExW.argtypes = [wintypes.LPCWSTR, wintypes.LPCWSTR, ctypes.c_void_p,
+                                 ctypes.c_void_p, ctypes.c_void_p, wintypes.DWORD]
+        _CopyFileExW.restype = wintypes.BOOL
+    except Exception:
+        _kernel32 = _CopyFileExW = None
+_COPY_FILE_FAIL_IF_EXISTS = 0x00000001
+_COPY_FILE_NO_BUFFERING = 0x00001000
+# 이 크기 이상은 캐시를 거치지 않는 직접 I/O 로 복사 (작은 파일은 버퍼드가 더 빠름)
+_COPY_NO_BUFFERING_MIN = 8 * 1024 * 1024
+_WIN_EXISTS_ERRORS = (80, 183)  # ERROR_FILE_EXISTS, ERROR_ALREADY_EXISTS
+
+def _kernel_copy(fin: int, fout: int) -> Optional[str]:
+    """열린 fd 간 커널 내 복사. 성공 시 "reflink"|"kcopy", 불가하면 None"""
+    if fcntl is not None:
+        try:
+            fcntl.ioctl(fout, _FICLONE, fin)  # XFS/Btrfs 등: 블록 공유(COW), 데이터 복사 없음
+            return "reflink"
+        except OSError:
+            pass
+    if hasattr(os, "copy_file_range"):
+        remaining = os.fstat(fin).st_size
+        try:
+            while remaining > 0:
+                n = os.copy_file_range(fin, fout, remaining)
+                if n == 0:
+                    break
+                remaining -= n
+        except OSError:
+            return None
+        if remaining <= 0:
+            return "kcopy"
+    return None
+
+def _link_or_copy(src: Path, dst: Path) -> str:
+    """
+    분류 폴더에 원본을 배치. 하드링크(즉시, 0바이트 복사) → OS 복사
+    (Linux: FICLONE reflink → copy_file_range, Windows: CopyFileExW) → shutil.copy2 순으로 시도.
+    반환: "exists" | "link" | "reflink" | "kcopy" | "copyfile" | "copy"
+    """
+    if dst.exists():
+        return "exists"
+    try:
+        os.link(src, dst)
+        return "link"
+    except FileExistsError:
+        return "exists"
+    except OSError:
+        pass
+    if _CopyFileExW is not None:
+        flags = _COPY_FILE_FAIL_IF_EXISTS
+        try:
+            if os.stat(src).st_size >= _COPY_NO_BUFFERING_MIN:
+                flags |= _COPY_FILE_NO_BUFFERING
+        except OSError:
+            pass
+        if _CopyFileExW(str(src), str(dst), None, None, None, flags):
+            return "copyfile"  # 속성/수정시각까지 OS 가 복사
+        if ctypes.get_last_error() in _WIN_EXISTS_ERRORS:
+            return "exists"
+    elif fcntl is not None or hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "xb") as fdst:
+                method = _kernel_copy(fsrc.fileno(), fdst.fileno())
+            if method:
+                shutil.copystat(src, dst)
+                return method
+        except FileExistsError:
+            return "exists"
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return "copy"
+
+# 배치 분류 시 동시에 진행할 링크/복사 작업 수 (썸네일 등 다른 IO_POOL 작업 몫을 남김)
+CLASSIFY_LINK_CONCURRENCY = 16
+
+_LINK_LOG_NOTE = {"link": "하드링크 생성", "reflink": "파일 복제(reflink)", "kcopy": "파일 복사(copy_file_range)",
+                  "copyfile": "파일 복사(CopyFileEx)", "copy": "파일 복사"}
+
 @app.post("/api/classify")
 async def classify_images(request: ClassifyRequest, _=Depends(labels_classes_sync_dep)):
     """이미지를 클래스로 분류하고 classification 디렉토리에 복사/링크"""
@@ -1960,34 +2853,20 @@ async def classify_images(request: ClassifyRequest, _=Depends(labels_classes_syn
         # 대상 파일 경로
         target_file = class_dir / abs_path.name
         
-        # 파일 복사 또는 하드링크 생성
-        try:
-            if abs_path.stat().st_dev == class_dir.stat().st_dev:
-                # 같은 드라이브면 하드링크 시도
-                if not target_file.exists():
-                    os.link(str(abs_path), str(target_file))
-                    log_access_row(tag="ACTION", note=f"하드링크 생성: {rel_path} -> {class_name}")
-            else:
-                # 다른 드라이브면 복사
-                if not target_file.exists():
-                    shutil.copy2(abs_path, target_file)
-                    log_access_row(tag="ACTION", note=f"파일 복사: {rel_path} -> {class_name}")
-        except (OSError, PermissionError) as e:
-            # 하드링크 실패시 복사로 폴백
-            if not target_file.exists():
-                shutil.copy2(abs_path, target_file)
-                log_access_row(tag="ACTION", note=f"복사 폴백: {rel_path} -> {class_name}")
+        # 하드링크 우선, 안 되면 복사 (다른 드라이브면 os.link 가 실패해 자동 폴백)
+        method = _link_or_copy(abs_path, target_file)
+        if method != "exists":
+            log_access_row(tag="ACTION", note=f"{_LINK_LOG_NOTE[method]}: {rel_path} -> {class_name}")
         
         # 라벨도 추가
         with LABELS_LOCK:
-            cur_labels = set(LABELS.get(rel_path, []))
+            cur_labels = LABELS.setdefault(rel_path, set())
             cur_labels.add(class_name)
-            LABELS[rel_path] = sorted(cur_labels)
+            labels = sorted(cur_labels)
         
-        _labels_save()
-        _dircache_invalidate(class_dir)
+        _labels_mark_dirty((rel_path,))
         
-        return {"success": True, "image": rel_path, "class": class_name, "labels": LABELS[rel_path]}
+        return {"success": True, "image": rel_path, "class": class_name, "labels": labels}
         
     except Exception as e:
         logger.exception(f"이미지 분류 실패: {e}")
@@ -2012,7 +2891,10 @@ async def classify_images_batch(request: BatchClassifyRequest, _=Depends(labels_
         results = []
         errors = []
         
+        # 1단계: 경로 검증만 하고 (rel, 원본, 대상) 목록 작성
+        planned = []
         for image_path in request.images:
+            rel_path = image_path
             try:
                 rel_path = _lookup_original_relpath_from_classification_path(image_path) or relkey_from_any_path(image_path)
                 abs_path = ROOT_DIR / rel_path
@@ -2025,38 +2907,30 @@ async def classify_images_batch(request: BatchClassifyRequest, _=Depends(labels_
                     errors.append(f"{rel_path}: 지원하지 않는 형식")
                     continue
                 
-                # 대상 파일 경로
-                target_file = class_dir / abs_path.name
-                
-                # 파일 복사 또는 하드링크 생성
-                try:
-                    if abs_path.stat().st_dev == class_dir.stat().st_dev:
-                        # 같은 드라이브면 하드링크 시도
-                        if not target_file.exists():
-                            os.link(str(abs_path), str(target_file))
-                    else:
-                        # 다른 드라이브면 복사
-                        if not target_file.exists():
-                            shutil.copy2(abs_path, target_file)
-                except (OSError, PermissionError):
-                    # 하드링크 실패시 복사로 폴백
-                    if not target_file.exists():
-                        shutil.copy2(abs_path, target_file)
-                
-                # 라벨도 추가
-                with LABELS_LOCK:
-                    cur_labels = set(LABELS.get(rel_path, []))
-                    cur_labels.add(class_name)
-                    LABELS[rel_path] = sorted(cur_labels)
-                
-                results.append(rel_path)
+                planned.append((rel_path, abs_path, class_dir / abs_path.name))
                 
             except Exception as e:
                 errors.append(f"{rel_path}: {str(e)}")
         
+        # 2단계: 하드링크/복사를 IO_POOL 에서 동시에 (동시 파일 작업 수는 세마포어로 제한)
+        loop = asyncio.get_running_loop()
+        sem = asyncio.Semaphore(CLASSIFY_LINK_CONCURRENCY)
+        async def _place(src: Path, dst: Path) -> str:
+            async with sem:
+                return await loop.run_in_executor(IO_POOL, _link_or_copy, src, dst)
+        outcomes = await asyncio.gather(*(_place(src, dst) for _, src, dst in planned), return_exceptions=True)
+        
+        # 3단계: 성공한 이미지 라벨을 락 한 번으로 추가
+        with LABELS_LOCK:
+            for (rel_path, _, _), outcome in zip(planned, outcomes):
+                if isinstance(outcome, Exception):
+                    errors.append(f"{rel_path}: {str(outcome)}")
+                    continue
+                LABELS.setdefault(rel_path, set()).add(class_name)
+                results.append(rel_path)
+        
         if results:
-            _labels_save()
-            _dircache_invalidate(class_dir)
+            _labels_mark_dirty(results)
         
         log_access_row(tag="ACTION", note=f"배치 분류: {len(results)}개 성공, {len(errors)}개 실패 -> {class_name}")
         
@@ -2094,31 +2968,19 @@ async def classify_images(request: ClassifyRequest, _=Depends(labels_classes_syn
         # 대상 파일 경로
         target_file = class_dir / abs_path.name
         
-        # 파일이 이미 존재하면 스킵
-        if target_file.exists():
+        # 하드링크 우선, 안 되면 복사 (이미 존재하면 스킵)
+        method = _link_or_copy(abs_path, target_file)
+        if method == "exists":
             logger.info(f"파일이 이미 존재함: {target_file}")
         else:
-            # 하드링크 시도, 실패하면 복사
-            try:
-                if abs_path.drive.lower() == target_file.drive.lower():
-                    os.link(str(abs_path), str(target_file))
-                    logger.info(f"하드링크 생성: {abs_path} -> {target_file}")
-                else:
-                    import shutil
-                    shutil.copy2(str(abs_path), str(target_file))
-                    logger.info(f"파일 복사: {abs_path} -> {target_file}")
-            except Exception as e:
-                import shutil
-                shutil.copy2(str(abs_path), str(target_file))
-                logger.info(f"하드링크 실패, 복사로 대체: {abs_path} -> {target_file}")
+            logger.info(f"{_LINK_LOG_NOTE[method]}: {abs_path} -> {target_file}")
         
         # 라벨 추가
         with LABELS_LOCK:
-            if rel_path not in LABELS:
-                LABELS[rel_path] = []
-            if class_name not in LABELS[rel_path]:
-                LABELS[rel_path].append(class_name)
-                _labels_save()
+            cur_labels = LABELS.setdefault(rel_path, set())
+            if class_name not in cur_labels:
+                cur_labels.add(class_name)
+                _labels_mark_dirty((rel_path,))
         
         return {"success": True, "message": f"Image classified as '{class_name}'"}
         
@@ -2146,12 +3008,8 @@ async def delete_classification(request: ClassifyDeleteRequest, _=Depends(labels
         elif request.image_name:
             target_file = class_dir / request.image_name
             # 원본 파일 경로 찾기
-            for root, dirs, files in os.walk(ROOT_DIR):
-                if request.image_name in files:
-                    abs_path = Path(root) / request.image_name
-                    rel_path = str(abs_path.relative_to(ROOT_DIR)).replace("\\", "/")
-                    break
-            else:
+            rel_path = _find_relpath_by_name(request.image_name)
+            if rel_path is None:
                 raise HTTPException(status_code=404, detail="Original image not found")
         else:
             raise HTTPException(status_code=400, detail="Either image_path or image_name required")
@@ -2164,15 +3022,13 @@ async def delete_classification(request: ClassifyDeleteRequest, _=Depends(labels
         
         # 라벨에서도 제거
         with LABELS_LOCK:
-            if rel_path in LABELS and class_name in LABELS[rel_path]:
-                new_labels = [x for x in LABELS[rel_path] if x != class_name]
-                if new_labels:
-                    LABELS[rel_path] = new_labels
-                else:
+            cur_labels = LABELS.get(rel_path)
+            if cur_labels and class_name in cur_labels:
+                cur_labels.discard(class_name)
+                if not cur_labels:
                     LABELS.pop(rel_path, None)
         
-        _labels_save()
-        _dircache_invalidate(class_dir)
+        _labels_mark_dirty((rel_path,))
         
         log_access_row(tag="ACTION", note=f"분류 제거: {rel_path} from {class_name}")
         
@@ -2192,6 +3048,7 @@ async def classify_delete_batch(request: ClassifyDeleteBatchReq, _=Depends(label
 
         class_dir = _classification_dir() / class_name
         removed = 0
+        touched = []
         for any_path in request.images:
             try:
                 rel_path = relkey_from_any_path(any_path)
@@ -2203,15 +3060,16 @@ async def classify_delete_batch(request: ClassifyDeleteBatchReq, _=Depends(label
                     except FileNotFoundError:
                         pass
                 with LABELS_LOCK:
-                    labels = set(LABELS.get(rel_path, []))
-                    if class_name in labels:
+                    labels = LABELS.get(rel_path)
+                    if labels and class_name in labels:
                         labels.discard(class_name)
-                        LABELS[rel_path] = sorted(labels) if labels else LABELS.pop(rel_path, None) or []
+                        if not labels: LABELS.pop(rel_path, None)
+                        touched.append(rel_path)
                 removed += 1
             except Exception:
                 continue
 
-        _labels_save(); _dircache_invalidate(class_dir)
+        if touched: _labels_mark_dirty(touched)
         log_access_row(tag="ACTION", note=f"배치 분류 제거: {removed} items from {class_name}")
         return {"success": True, "removed": removed, "class": class_name}
     except HTTPException:
@@ -2224,41 +3082,85 @@ async def classify_delete_batch(request: ClassifyDeleteBatchReq, _=Depends(label
 app.mount("/js", StaticFiles(directory="js"), name="js")
 app.mount("/static", StaticFiles(directory="."), name="static")
 
+# 파일명 → (mtime_ns, size, etag, 원본, gzip, brotli|None). 파일이 바뀌면 다시 압축
+_PAGE_CACHE: Dict[str, Tuple[int, int, str, bytes, bytes, Optional[bytes]]] = {}
+# 정적 페이지 파일 재확인 주기: 이 시간 안의 요청은 stat 없이 메모리 본문으로 응답 (편집은 최대 1초 뒤 반영)
+PAGE_RESTAT_SECONDS = 1.0
+_PAGE_CHECKED: Dict[str, float] = {}
+
+def _load_page(filename: str, st: os.stat_result):
+    cached = _PAGE_CACHE.get(filename)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached
+    raw = Path(filename).read_bytes()
+    gz = gzip.compress(raw, compresslevel=9)
+    br = brotli.compress(raw, quality=11) if _BROTLI_AVAILABLE else None
+    entry = (st.st_mtime_ns, st.st_size, compute_etag(st), raw, gz, br)
+    _PAGE_CACHE[filename] = entry
+    return entry
+
+async def _serve_page(request: Request, filename: str, media_type: str):
+    """정적 페이지를 메모리에 미리 압축해 둔 본문으로 응답 (요청마다 재압축/재stat 없음)"""
+    entry = _PAGE_CACHE.get(filename)
+    now = time.monotonic()
+    if entry is None or now - _PAGE_CHECKED.get(filename, 0.0) >= PAGE_RESTAT_SECONDS:
+        st = _stat_or_none(filename)
+        if st is None:
+            return {"message": f"{filename} not found"}
+        if entry is None or entry[0] != st.st_mtime_ns or entry[1] != st.st_size:
+            entry = await asyncio.get_running_loop().run_in_executor(IO_POOL, _load_page, filename, st)
+        _PAGE_CHECKED[filename] = now
+    _, _, etag, raw, gz, br = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    accept = request.headers.get("accept-encoding", "")
+    if br is not None and "br" in accept:
+        headers["Content-Encoding"] = "br"
+        body = br
+    elif "gzip" in accept:
+        headers["Content-Encoding"] = "gzip"
+        body = gz
+    else:
+        body = raw
+    return Response(content=body, media_type=media_type, headers=headers)
+
 @app.get("/")
-async def read_root():
+async def read_root(request: Request):
     try:
-        html_path = Path("index.html")
-        return FileResponse(html_path) if html_path.exists() else {"message": "index.html not found"}
+        return await _serve_page(request, "index.html", "text/html; charset=utf-8")
     except Exception as e:
         logger.exception(f"루트 페이지 로드 실패: {e}")
         return {"error": "Failed to load main page"}
 
 @app.get("/stats")
-async def read_stats():
+async def read_stats(request: Request):
     try:
-        stats_path = Path("stats.html")
-        return FileResponse(stats_path) if stats_path.exists() else {"message": "stats.html not found"}
+        return await _serve_page(request, "stats.html", "text/html; charset=utf-8")
     except Exception as e:
         logger.exception(f"통계 페이지 로드 실패: {e}")
         return {"error": "Failed to load stats page"}
 
 @app.get("/main.js")
-async def get_main_js():
+async def get_main_js(request: Request):
     try:
-        js_path = Path("main.js")
-        return FileResponse(js_path) if js_path.exists() else {"message": "main.js not found"}
+        return await _serve_page(request, "main.js", "application/javascript")
     except Exception as e:
         logger.exception(f"main.js 로드 실패: {e}")
         return {"error": "Failed to load main.js"}
 
 # ---------------- Folder / Lifecycle ----------------
+# 폴링되는 폴더 조회 응답은 미리 직렬화 (current 는 change-folder 에서 갱신)
+_ROOT_FOLDER_JSON = _json_dumps({"root_folder": str(ORIGINAL_ROOT_DIR)})
+_CURRENT_FOLDER_JSON = _json_dumps({"current_folder": ROOT_STR})
+
 @app.get("/api/current-folder")
-async def get_current_folder(): return {"current_folder": str(ROOT_DIR)}
+async def get_current_folder():
+    return Response(content=_CURRENT_FOLDER_JSON, media_type="application/json")
 
 @app.get("/api/root-folder")
 async def get_root_folder():
-    from .config import ROOT_DIR as ORIGINAL_ROOT_DIR
-    return {"root_folder": str(ORIGINAL_ROOT_DIR)}
+    return Response(content=_ROOT_FOLDER_JSON, media_type="application/json")
 
 @app.post("/api/change-folder")
 async def change_folder(request: Request):
@@ -2270,18 +3172,28 @@ async def change_folder(request: Request):
         if not new_path_obj.exists(): raise HTTPException(status_code=404, detail="폴더가 존재하지 않습니다")
         if not new_path_obj.is_dir(): raise HTTPException(status_code=400, detail="유효한 폴더가 아닙니다")
 
-        global ROOT_DIR, THUMBNAIL_DIR, LABELS_DIR, LABELS_FILE
+        global ROOT_DIR, ROOT_STR, ROOT_PREFIX, THUMBNAIL_DIR, LABELS_DIR, LABELS_FILE, _CURRENT_FOLDER_JSON
+        # 이전 폴더의 labels.json 에 보류 중인 변경을 먼저 기록
+        _labels_flush()
         ROOT_DIR = new_path_obj
+        ROOT_STR = str(ROOT_DIR)
+        ROOT_PREFIX = ROOT_STR if ROOT_STR.endswith(os.sep) else ROOT_STR + os.sep
+        _CURRENT_FOLDER_JSON = _json_dumps({"current_folder": ROOT_STR})
         # 썸네일은 항상 이미지 루트(최초 설정 경로)의 thumbnails 폴더를 사용
-        from .config import ROOT_DIR as ORIGINAL_ROOT_DIR
-        THUMBNAIL_DIR = Path(ORIGINAL_ROOT_DIR) / "thumbnails"
+        THUMBNAIL_DIR = ORIGINAL_ROOT_DIR / "thumbnails"
         # 라벨 저장 폴더는 현재 탐색 폴더 기준으로 유지 (의도된 동작)
         LABELS_DIR = ROOT_DIR / "classification"
         LABELS_FILE = LABELS_DIR / "labels.json"
 
         DIRLIST_CACHE.clear();  THUMB_STAT_CACHE.clear()
-        global INDEX_READY, INDEX_BUILDING
+        _thumbnail_path_cached.cache_clear()
+        _resolve_under_root.cache_clear()
+        global INDEX_READY, INDEX_BUILDING, FILE_INDEX
         INDEX_READY = False; INDEX_BUILDING = False
+        # 인덱스 키는 ROOT 기준 상대경로라 새 ROOT 에서는 재사용 불가
+        FILE_INDEX = FileIndex()
+        _stop_index_watcher()
+        _start_index_watcher()
 
         classification_dir = _classification_dir()
         if not classification_dir.exists():
@@ -2289,45 +3201,52 @@ async def change_folder(request: Request):
             log_access_row(tag="INFO", note=f"새 폴더의 classification 폴더 생성: {classification_dir}")
 
         _labels_load()
+        _classes_reset()
         return {"success": True, "message": f"폴더가 '{new_path}'로 변경되었습니다", "new_path": str(ROOT_DIR)}
     except Exception as e:
         logger.error(f"폴더 변경 실패: {e}")
         raise HTTPException(status_code=500, detail=f"폴더 변경 실패: {str(e)}")
 
+def _drive_letters() -> List[str]:
+    """존재하는 드라이브 문자 목록. Windows 는 GetLogicalDrives 비트마스크 1회 조회
+    (드라이브마다 stat 하지 않으므로 빈 광학 드라이브가 깨어나지 않음)"""
+    if _kernel32 is not None:
+        mask = _kernel32.GetLogicalDrives()
+        if mask:
+            return [chr(65 + i) for i in range(26) if mask >> i & 1]
+    import string
+    return [letter for letter in string.ascii_uppercase if Path(f"{letter}:\\").exists()]
+
 @app.get("/api/browse-folders")
 async def browse_folders(path: Optional[str] = None):
     try:
         if not path:
-            import string
-            drives = []
-            for letter in string.ascii_uppercase:
-                drive_path = f"{letter}:\\"
-                if Path(drive_path).exists():
-                    drives.append({"name": f"{letter}: 드라이브", "path": drive_path, "type": "drive"})
+            drives = [{"name": f"{letter}: 드라이브", "path": f"{letter}:\\", "type": "drive"}
+                      for letter in _drive_letters()]
             return {"folders": drives}
 
         target_path = Path(path).resolve()
         if not target_path.exists() or not target_path.is_dir():
             raise HTTPException(status_code=404, detail="폴더를 찾을 수 없습니다")
 
-        folders = []
-        skip_set = {s.strip().lower() for s in SKIP_DIRS}
+        # Windows 의 os.scandir 는 FindFirstFileW/FindNextFileW 결과로 is_dir 를 답하므로 항목별 추가 호출 없음
+        names = []
         try:
             with os.scandir(target_path) as it:
                 for entry in it:
-                    if not entry.is_dir(follow_symlinks=False):
-                        continue
-                    name_low = entry.name.lower()
-                    if entry.name.startswith('.'):
-                        continue
-                    if name_low in skip_set:
+                    name = entry.name
+                    if name[0] == '.' or name.lower() in SKIP_DIRS_LOWER:
                         continue
-                    folders.append({"name": entry.name, "path": str(entry.path), "type": "folder"})
+                    if entry.is_dir(follow_symlinks=False):
+                        names.append(name)
         except PermissionError:
             raise HTTPException(status_code=403, detail="폴더 접근 권한이 없습니다")
 
-        folders.sort(key=lambda x: x["name"].lower(), reverse=True)
-        return {"folders": folders}
+        # dict 를 만들기 전에 이름 문자열만 정렬
+        names.sort(key=str.lower, reverse=True)
+        base = str(target_path)
+        prefix = base if base.endswith(os.sep) else base + os.sep
+        return {"folders": [{"name": name, "path": prefix + name, "type": "folder"} for name in names]}
     except Exception as e:
         logger.error(f"폴더 브라우징 실패: {e}")
         raise HTTPException(status_code=500, detail=f"폴더 브라우징 실패: {str(e)}")
@@ -2335,14 +3254,16 @@ async def browse_folders(path: Optional[str] = None):
 # ======================== Lifecycle ========================
 @app.on_event("startup")
 async def startup_event():
+    if _ACCESS_LOG_WRITER is not None:
+        _ACCESS_LOG_WRITER.start()  # 이전 shutdown 에서 정지됐을 때만 재시작 (중복 호출 무해)
     bootlog = logging.getLogger("uvicorn.error")
     bootlog.info("L3Tracker 서버 시작 (테이블 로그 시스템)")
-    scheme = "HTTPS" if config.SSL_ENABLED else "HTTP"
-    port_to_log = config.HTTPS_PORT if config.SSL_ENABLED else config.DEFAULT_PORT
+    scheme = "HTTPS" if S.ssl_enabled else "HTTP"
+    port_to_log = S.https_port if S.ssl_enabled else S.default_port
     # Windows 콘솔(cp949) 환경에서 이모지 출력 시 UnicodeEncodeError가 발생할 수 있어 ASCII로 표기
-    bootlog.info(f"HOST: {config.DEFAULT_HOST}")
+    bootlog.info(f"HOST: {S.default_host}")
     bootlog.info(f"PORT: {port_to_log} ({scheme})")
-    bootlog.info(f"ROOT_DIR: {config.ROOT_DIR}")
+    bootlog.info(f"ROOT_DIR: {S.root_dir}")
     bootlog.info(f"PROJECT_ROOT: {os.getenv('PROJECT_ROOT', 'NOT SET')}")
     bootlog.info("=" * 50)
     print_access_header_once()
@@ -2365,31 +3286,50 @@ async def startup_event():
         pass
 
     _labels_load()
-    global CLASSES_MTIME
-    CLASSES_MTIME = _classes_stat_mtime()
+    global _LABELS_FLUSH_EVENT, _LABELS_FLUSH_LOOP
+    _classes_reset()
+    _LABELS_FLUSH_LOOP = asyncio.get_running_loop()
+    _LABELS_FLUSH_EVENT = asyncio.Event()
+    asyncio.create_task(_labels_flusher())
+    _warm_image_decoders()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _load_file_index)
+    _start_index_watcher()
+    # 로드한 인덱스도 서버가 꺼져 있던 동안의 변경을 반영하도록 백그라운드에서 갱신
     asyncio.create_task(build_file_index_background())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    global _LABELS_FLUSH_EVENT
+    _LABELS_FLUSH_EVENT = None
+    try:
+        _labels_flush()
+    except Exception:
+        pass
+    _stop_index_watcher()
+    SEARCH_POOL.shutdown(wait=False, cancel_futures=True)
+    if len(FILE_INDEX):
+        await asyncio.get_running_loop().run_in_executor(None, _save_file_index)
     logging.getLogger("uvicorn.error").info("L3Tracker 서버 종료")
+    if _ACCESS_LOG_WRITER is not None:
+        _ACCESS_LOG_WRITER.stop()  # 큐에 남은 행까지 출력 후 스레드 종료
 
 # ======================== __main__ ========================
 if __name__ == "__main__":
     import uvicorn
-    import multiprocessing
 
-    if not config.SSL_ENABLED:
+    if not S.ssl_enabled:
         logger.error("[SSL] SSL_ENABLED=0 입니다. 이 실행파일은 HTTPS만 지원합니다.")
         sys.exit(2)
 
-    cert_path = Path(str(config.SSL_CERTFILE)).resolve()
-    key_path  = Path(str(config.SSL_KEYFILE)).resolve()
+    cert_path = Path(str(S.ssl_certfile)).resolve()
+    key_path  = Path(str(S.ssl_keyfile)).resolve()
     if not cert_path.exists() or not key_path.exists():
         logger.error(f"[SSL] 인증서/키 파일이 없습니다.\n  CERT: {cert_path}\n  KEY : {key_path}")
         sys.exit(2)
 
     reload_flag = os.getenv("RELOAD", "1") == "1"
-    logger.info(f"[SSL] HTTPS 모드 활성화: 포트 {config.HTTPS_PORT}")
+    logger.info(f"[SSL] HTTPS 모드 활성화: 포트 {S.https_port}")
     logger.info(f"[SSL] CERTFILE={cert_path}")
     logger.info(f"[SSL] KEYFILE={key_path}")
 
@@ -2403,16 +3343,27 @@ if __name__ == "__main__":
         except Exception:
             workers_env = 1
     else:
-        try:
-            cpu_cnt = max(1, multiprocessing.cpu_count())
-            workers_env = max(2, min(64, int(cpu_cnt * 0.75)))
-        except Exception:
-            workers_env = 2
+        workers_env = max(2, min(64, int(S.cpu_count * 0.75)))
+
+    # 워커가 여럿이면 파일 감시(워커별 인메모리 인덱스 갱신)는 기본 OFF. 켜더라도 한 워커만 선출되어 감시함
+    # (워커 프로세스는 환경변수를 물려받아 config 에서 읽음)
+    if workers_env > 1 and not reload_flag:
+        os.environ.setdefault("INDEX_WATCH", "0")
+
+    # 이벤트 루프/HTTP 파서를 C 구현으로 명시 (uvicorn[standard]). 미설치 항목은 uvicorn 기본값(asyncio/h11)
+    import importlib.util
+    server_impl = {}
+    if sys.platform != "win32" and importlib.util.find_spec("uvloop") is not None:
+        server_impl["loop"] = "uvloop"
+    if importlib.util.find_spec("httptools") is not None:
+        server_impl["http"] = "httptools"
+    logger.info(f"[ASGI] loop={server_impl.get('loop', 'asyncio')} http={server_impl.get('http', 'h11')}")
+
     # reload 사용 시 workers=1 고정. reload 비사용 시 환경변수로 워커 수 제어
     uvicorn.run(
         "api.main:app",
         host="0.0.0.0",
-        port=int(config.HTTPS_PORT),        # 기본 8443
+        port=int(S.https_port),        # 기본 8443
         reload=reload_flag,                 # 개발 편의
         workers=(1 if reload_flag else max(1, workers_env)),
         log_level="info",
@@ -2421,4 +3372,5 @@ if __name__ == "__main__":
         log_config=None,
         ssl_certfile=str(cert_path),
         ssl_keyfile=str(key_path),
+        **server_impl,
     )